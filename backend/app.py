@@ -7,12 +7,15 @@ from datetime import datetime
 import os
 from dotenv import load_dotenv
 
-from routes import risk_routes, action_routes, climate_routes, footprint_routes, prediction_routes
-from services.database import init_db
-
-# Load environment variables
+# Load environment variables before the app modules read their settings at import time
 load_dotenv()
 
+from routes import risk_routes, action_routes, climate_routes, footprint_routes, prediction_routes
+from services.database import init_db, write_behind_queue, statement_stats, WRITE_BEHIND_ENABLED
+from services.climate_service import climate_service
+from models.action_model import action_planner_ai
+from services.prediction_service import prediction_service
+
 # Create FastAPI app
 app = FastAPI(
     title="AI Climate Risk and Action Planner API",
@@ -43,6 +46,18 @@ async def startup_event():
     """Initialize database on startup"""
     await init_db()
     print("🌍 Database initialized successfully!")
+    await climate_service.startup()
+    if WRITE_BEHIND_ENABLED:
+        write_behind_queue.start()
+    action_planner_ai.start_catalog_watch()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush buffered writes and release pooled connections on shutdown"""
+    await write_behind_queue.stop()
+    await climate_service.shutdown()
+    await action_planner_ai.stop_catalog_watch()
+    prediction_service.shutdown()
 
 @app.get("/")
 async def root():
@@ -64,7 +79,9 @@ async def health_check():
             "database": "operational",
             "ai_models": "operational",
             "external_apis": "operational"
-        }
+        },
+        "write_behind": write_behind_queue.stats(),
+        "database_statements": statement_stats
     }
 
 if __name__ == "__main__":
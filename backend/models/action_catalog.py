@@ -0,0 +1,107 @@
+import json
+import os
+import sys
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Tuple
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "action_catalog.json")
+
+ACTION_FIELDS = (
+    "title", "description", "category", "priority",
+    "estimated_cost", "impact_score", "timeframe"
+)
+
+PRIORITY_ORDER = {"critical": 4, "high": 3, "medium": 2, "low": 1}
+TIMEFRAME_ORDER = ("immediate", "short-term", "medium-term", "long-term")
+
+# Short, highly repeated strings shared across records
+_INTERNED_FIELDS = ("title", "category", "priority", "timeframe")
+
+class ActionRecord:
+    """Immutable catalog entry; payload is a read-only view shared by every plan that includes it"""
+
+    __slots__ = ACTION_FIELDS + ("risk_type", "payload")
+
+    def __init__(self, risk_type: str, fields: Dict[str, Any]):
+        missing = [name for name in ACTION_FIELDS if name not in fields]
+        if missing:
+            raise ValueError(f"Action '{fields.get('title', '?')}' is missing: {', '.join(missing)}")
+
+        values = {name: fields[name] for name in ACTION_FIELDS}
+        for name in _INTERNED_FIELDS:
+            values[name] = sys.intern(str(values[name]))
+        for name in ("estimated_cost", "impact_score"):
+            if not isinstance(values[name], (int, float)):
+                raise ValueError(f"Action '{values['title']}' has a non-numeric {name}")
+        if values["priority"] not in PRIORITY_ORDER:
+            raise ValueError(f"Action '{values['title']}' has an unknown priority: {values['priority']}")
+        if values["timeframe"] not in TIMEFRAME_ORDER:
+            raise ValueError(f"Action '{values['title']}' has an unknown timeframe: {values['timeframe']}")
+
+        setter = object.__setattr__
+        for name, value in values.items():
+            setter(self, name, value)
+        setter(self, "risk_type", sys.intern(risk_type))
+        setter(self, "payload", MappingProxyType(values))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ActionRecord is immutable")
+
+    def __repr__(self) -> str:
+        return f"ActionRecord({self.risk_type!r}, {self.title!r})"
+
+class ActionCatalog:
+    """Versioned, read-only action catalog loaded from a data file"""
+
+    __slots__ = ("version", "path", "mtime", "actions", "general")
+
+    def __init__(
+        self,
+        version: str,
+        actions: Mapping[str, Tuple[ActionRecord, ...]],
+        general: Tuple[ActionRecord, ...],
+        path: str = "",
+        mtime: float = 0.0
+    ):
+        setter = object.__setattr__
+        setter(self, "version", version)
+        setter(self, "actions", MappingProxyType(dict(actions)))
+        setter(self, "general", general)
+        setter(self, "path", path)
+        setter(self, "mtime", mtime)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ActionCatalog is immutable")
+
+    def action_database(self) -> Dict[str, List[Mapping]]:
+        """Actions per risk type as the shared, read-only record payloads"""
+        return {
+            risk_type: [record.payload for record in records]
+            for risk_type, records in self.actions.items()
+        }
+
+    def general_actions(self) -> List[Mapping]:
+        """General preparedness actions as read-only payloads"""
+        return [record.payload for record in self.general]
+
+    def __len__(self) -> int:
+        return sum(len(records) for records in self.actions.values()) + len(self.general)
+
+def parse_action_catalog(data: Dict[str, Any], path: str = "", mtime: float = 0.0) -> ActionCatalog:
+    """Build a catalog from its JSON document ({"version", "risk_types", "general"})"""
+    if "version" not in data or "risk_types" not in data:
+        raise ValueError("Action catalog needs 'version' and 'risk_types'")
+
+    actions = {
+        sys.intern(risk_type): tuple(ActionRecord(risk_type, entry) for entry in entries)
+        for risk_type, entries in data["risk_types"].items()
+    }
+    general = tuple(ActionRecord("general", entry) for entry in data.get("general", []))
+    return ActionCatalog(str(data["version"]), actions, general, path, mtime)
+
+def load_action_catalog(path: str = DEFAULT_CATALOG_PATH) -> ActionCatalog:
+    """Read and validate the action catalog file"""
+    mtime = os.stat(path).st_mtime
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return parse_action_catalog(data, path, mtime)
@@ -1,14 +1,159 @@
 import os
-from typing import Dict, List, Any
+import asyncio
+import hashlib
+import itertools
+import signal
+from typing import Dict, List, Any, Iterable, Optional, Sequence, Tuple
 import json
 from datetime import datetime
 
+from models.action_optimizer import optimize_actions
+from models.action_catalog import ActionCatalog, DEFAULT_CATALOG_PATH, PRIORITY_ORDER, load_action_catalog
+from services.cache import TTLCache
+
+# Score bands used to filter a risk type's actions, highest threshold first
+SCORE_BANDS = (
+    ("high", 70, ("critical", "high", "medium", "low")),
+    ("moderate", 40, ("critical", "high")),
+    ("low", None, ("critical",))
+)
+
+def score_band(risk_score: float) -> str:
+    """Band a risk score falls in (>70 high, >40 moderate, else low)"""
+    for band, threshold, _ in SCORE_BANDS:
+        if threshold is None or risk_score > threshold:
+            return band
+    return SCORE_BANDS[-1][0]
+
+def _priority_key(action: Dict) -> Tuple[int, float]:
+    return (PRIORITY_ORDER.get(action["priority"], 0), action["impact_score"])
+
 class ActionPlannerAI:
     """AI model for generating climate action recommendations"""
     
     def __init__(self):
         self.openai_api_key = os.getenv("OPENAI_API_KEY", "")
-        self.action_database = self._load_action_database()
+        self.catalog_path = os.getenv("ACTION_CATALOG_PATH", DEFAULT_CATALOG_PATH)
+        self.catalog_poll_seconds = float(os.getenv("ACTION_CATALOG_POLL_SECONDS", 5))
+        self._watch_task: Optional[asyncio.Task] = None
+        self._catalog_seen_mtime = 0.0
+        
+        # Serialized plans keyed by quantized risk profile, cleared on catalog changes
+        self.plan_cache = TTLCache(
+            maxsize=int(os.getenv("ACTION_PLAN_CACHE_MAX_ENTRIES", 4096)),
+            ttl=float(os.getenv("ACTION_PLAN_CACHE_TTL_SECONDS", 3600))
+        )
+        self.set_catalog(load_action_catalog(self.catalog_path))
+    
+    def set_catalog(self, catalog: ActionCatalog):
+        """Install a loaded catalog and its general preparedness actions"""
+        self.catalog = catalog
+        self._catalog_seen_mtime = catalog.mtime
+        self.general_actions = self._sorted_actions(catalog.general_actions())
+        self.set_action_database(catalog.action_database())
+    
+    def set_action_database(self, action_database: Dict[str, List[Dict]]):
+        """Install an action catalog, rebuilding indexes and dropping cached plans"""
+        self.action_index = self._build_action_index(action_database)
+        self.action_database = action_database
+        self.plan_cache.clear()
+    
+    async def reload_catalog(self, force: bool = False) -> bool:
+        """Reload the catalog file if it changed; returns True when a new catalog was installed
+        
+        Parsing runs in a worker thread. The swap itself happens on the event
+        loop between requests, so a plan is always built from one catalog.
+        A file that fails to load leaves the current catalog in place.
+        """
+        try:
+            mtime = os.stat(self.catalog_path).st_mtime
+            if not force and mtime == self._catalog_seen_mtime:
+                return False
+            # Remember the attempt so a broken file is reported once, not every poll
+            self._catalog_seen_mtime = mtime
+            loop = asyncio.get_running_loop()
+            catalog = await loop.run_in_executor(None, load_action_catalog, self.catalog_path)
+        except Exception as e:
+            print(f"Action catalog reload failed: {e}")
+            return False
+        
+        self.set_catalog(catalog)
+        print(f"Action catalog {catalog.version} loaded ({len(catalog)} actions)")
+        return True
+    
+    def start_catalog_watch(self):
+        """Poll the catalog file for changes and reload on SIGHUP"""
+        loop = asyncio.get_running_loop()
+        if self.catalog_poll_seconds > 0 and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch_catalog())
+        if hasattr(signal, "SIGHUP"):
+            try:
+                loop.add_signal_handler(
+                    signal.SIGHUP,
+                    lambda: asyncio.ensure_future(self.reload_catalog(force=True))
+                )
+            except (NotImplementedError, RuntimeError, ValueError):
+                # Windows event loops and non-main threads cannot install handlers
+                pass
+    
+    async def stop_catalog_watch(self):
+        """Stop polling the catalog file"""
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+    
+    async def _watch_catalog(self):
+        while True:
+            await asyncio.sleep(self.catalog_poll_seconds)
+            await self.reload_catalog()
+    
+    def plan_cache_key(
+        self,
+        risk_assessment: Dict[str, Any],
+        user_profile: Optional[Dict[str, Any]] = None
+    ) -> Tuple:
+        """Inputs that fully determine a plan: risk level, top risk types and their score bands"""
+        risks = tuple(
+            (risk["type"], score_band(risk["score"]))
+            for risk in risk_assessment.get("top_risks", [])
+        )
+        profile_hash = None
+        if user_profile:
+            profile_json = json.dumps(user_profile, sort_keys=True, default=str)
+            profile_hash = hashlib.sha1(profile_json.encode()).hexdigest()
+        return (risk_assessment.get("risk_level", "moderate"), risks, profile_hash)
+    
+    def generate_action_plan_body(
+        self,
+        risk_assessment: Dict[str, Any],
+        user_profile: Dict[str, Any] = None
+    ) -> Tuple[Dict[str, Any], bytes]:
+        """Generate an action plan and its JSON body, reusing cached plans for the same profile
+        
+        Only location and generated_at differ between plans with the same key,
+        so they are patched into the cached body instead of re-serializing it.
+        """
+        key = self.plan_cache_key(risk_assessment, user_profile)
+        cached = self.plan_cache.get(key)
+        if cached is None:
+            plan = self.generate_action_plan(risk_assessment, user_profile)
+            del plan["location"], plan["generated_at"]
+            cached = (plan, json.dumps(plan, separators=(",", ":")).encode())
+            self.plan_cache.set(key, cached)
+        
+        plan, body = cached
+        location = risk_assessment.get("location", "Unknown")
+        generated_at = datetime.utcnow().isoformat()
+        body = b"".join((
+            b'{"location":', json.dumps(location).encode(),
+            b',"generated_at":', json.dumps(generated_at).encode(),
+            b",", body[1:]
+        ))
+        return {"location": location, **plan, "generated_at": generated_at}, body
     
     def generate_action_plan(
         self,
@@ -22,336 +167,89 @@ class ActionPlannerAI:
         risk_breakdown = risk_assessment.get("risk_breakdown", {})
         top_risks = risk_assessment.get("top_risks", [])
         
-        # Generate actions for top risks
-        actions = []
+        # Presorted actions for top risks
+        action_lists = []
         for risk in top_risks:
             risk_type = risk["type"]
             risk_score = risk["score"]
             
-            risk_actions = self._get_actions_for_risk(risk_type, risk_score, user_profile)
-            actions.extend(risk_actions)
+            action_lists.append(self._get_actions_for_risk(risk_type, risk_score, user_profile))
         
         # Add general preparedness actions
-        general_actions = self._get_general_preparedness_actions(risk_level)
-        actions.extend(general_actions)
+        action_lists.append(self._get_general_preparedness_actions(risk_level))
         
         # Prioritize actions
-        prioritized_actions = self._prioritize_actions(actions, risk_level)
+        prioritized_actions = self._merge_prioritized(action_lists)
+        
+        # Budget mode: best total impact the user can afford
+        optimized = bool(user_profile) and user_profile.get("budget") is not None
+        if optimized:
+            prioritized_actions = optimize_actions(prioritized_actions, user_profile)
         
         # Calculate estimated impact and cost
         total_cost = sum(action.get("estimated_cost", 0) for action in prioritized_actions)
         avg_impact = sum(action.get("impact_score", 50) for action in prioritized_actions) / len(prioritized_actions) if prioritized_actions else 0
         
-        return {
+        plan = {
             "location": location,
             "risk_level": risk_level,
-            "actions": prioritized_actions,
+            # Catalog payloads are shared read-only views; each plan gets its own dicts
+            "actions": [dict(action) for action in prioritized_actions],
             "total_actions": len(prioritized_actions),
             "estimated_total_cost": round(total_cost, 2),
             "estimated_impact": round(avg_impact, 2),
             "timeline": self._generate_timeline(prioritized_actions),
             "generated_at": datetime.utcnow().isoformat()
         }
+        if optimized:
+            plan["budget"] = float(user_profile["budget"])
+        
+        return plan
     
-    def _load_action_database(self) -> Dict[str, List[Dict]]:
-        """Load action recommendations database"""
+    def _build_action_index(
+        self,
+        action_database: Dict[str, List[Dict]]
+    ) -> Dict[str, Dict[str, Tuple[Dict, ...]]]:
+        """Presort each risk type's actions per score band"""
         return {
-            "flood": [
-                {
-                    "title": "Install Flood Barriers",
-                    "description": "Install flood barriers or sandbags around vulnerable entry points",
-                    "category": "infrastructure",
-                    "priority": "high",
-                    "estimated_cost": 500,
-                    "impact_score": 80,
-                    "timeframe": "immediate"
-                },
-                {
-                    "title": "Elevate Critical Systems",
-                    "description": "Raise electrical panels, HVAC systems, and appliances above potential flood levels",
-                    "category": "infrastructure",
-                    "priority": "high",
-                    "estimated_cost": 2000,
-                    "impact_score": 85,
-                    "timeframe": "short-term"
-                },
-                {
-                    "title": "Improve Drainage",
-                    "description": "Clear gutters and improve yard drainage to redirect water away from structures",
-                    "category": "maintenance",
-                    "priority": "medium",
-                    "estimated_cost": 300,
-                    "impact_score": 60,
-                    "timeframe": "immediate"
-                },
-                {
-                    "title": "Purchase Flood Insurance",
-                    "description": "Obtain flood insurance coverage for property protection",
-                    "category": "financial",
-                    "priority": "high",
-                    "estimated_cost": 1000,
-                    "impact_score": 90,
-                    "timeframe": "immediate"
-                }
-            ],
-            "wildfire": [
-                {
-                    "title": "Create Defensible Space",
-                    "description": "Clear vegetation within 30 feet of structures to create a defensible space",
-                    "category": "landscaping",
-                    "priority": "critical",
-                    "estimated_cost": 800,
-                    "impact_score": 90,
-                    "timeframe": "immediate"
-                },
-                {
-                    "title": "Use Fire-Resistant Materials",
-                    "description": "Replace roof and siding with fire-resistant materials",
-                    "category": "infrastructure",
-                    "priority": "high",
-                    "estimated_cost": 5000,
-                    "impact_score": 85,
-                    "timeframe": "medium-term"
-                },
-                {
-                    "title": "Install Fire Detection Systems",
-                    "description": "Install smoke detectors and fire suppression systems",
-                    "category": "safety",
-                    "priority": "high",
-                    "estimated_cost": 1500,
-                    "impact_score": 75,
-                    "timeframe": "short-term"
-                },
-                {
-                    "title": "Prepare Evacuation Kit",
-                    "description": "Prepare emergency evacuation kit with essentials and important documents",
-                    "category": "preparedness",
-                    "priority": "critical",
-                    "estimated_cost": 200,
-                    "impact_score": 80,
-                    "timeframe": "immediate"
-                }
-            ],
-            "hurricane": [
-                {
-                    "title": "Install Storm Shutters",
-                    "description": "Install hurricane shutters or impact-resistant windows",
-                    "category": "infrastructure",
-                    "priority": "high",
-                    "estimated_cost": 3000,
-                    "impact_score": 85,
-                    "timeframe": "short-term"
-                },
-                {
-                    "title": "Reinforce Roof",
-                    "description": "Strengthen roof structure and secure roof shingles",
-                    "category": "infrastructure",
-                    "priority": "high",
-                    "estimated_cost": 4000,
-                    "impact_score": 80,
-                    "timeframe": "medium-term"
-                },
-                {
-                    "title": "Secure Outdoor Items",
-                    "description": "Create plan to secure or store outdoor furniture and equipment",
-                    "category": "preparedness",
-                    "priority": "medium",
-                    "estimated_cost": 100,
-                    "impact_score": 60,
-                    "timeframe": "immediate"
-                },
-                {
-                    "title": "Stock Emergency Supplies",
-                    "description": "Maintain 7-day supply of water, food, and medications",
-                    "category": "preparedness",
-                    "priority": "critical",
-                    "estimated_cost": 300,
-                    "impact_score": 90,
-                    "timeframe": "immediate"
-                }
-            ],
-            "drought": [
-                {
-                    "title": "Install Water-Efficient Fixtures",
-                    "description": "Replace fixtures with low-flow toilets, faucets, and showerheads",
-                    "category": "infrastructure",
-                    "priority": "medium",
-                    "estimated_cost": 600,
-                    "impact_score": 70,
-                    "timeframe": "short-term"
-                },
-                {
-                    "title": "Implement Rainwater Harvesting",
-                    "description": "Install rainwater collection system for irrigation",
-                    "category": "infrastructure",
-                    "priority": "medium",
-                    "estimated_cost": 1500,
-                    "impact_score": 75,
-                    "timeframe": "medium-term"
-                },
-                {
-                    "title": "Plant Drought-Resistant Vegetation",
-                    "description": "Replace lawn with native, drought-tolerant plants",
-                    "category": "landscaping",
-                    "priority": "high",
-                    "estimated_cost": 1000,
-                    "impact_score": 80,
-                    "timeframe": "short-term"
-                },
-                {
-                    "title": "Optimize Irrigation",
-                    "description": "Install smart irrigation controllers and drip irrigation systems",
-                    "category": "infrastructure",
-                    "priority": "medium",
-                    "estimated_cost": 800,
-                    "impact_score": 70,
-                    "timeframe": "short-term"
-                }
-            ],
-            "heatwave": [
-                {
-                    "title": "Improve Home Insulation",
-                    "description": "Add insulation to attic and walls to maintain cool temperatures",
-                    "category": "infrastructure",
-                    "priority": "high",
-                    "estimated_cost": 2000,
-                    "impact_score": 75,
-                    "timeframe": "medium-term"
-                },
-                {
-                    "title": "Install Reflective Roofing",
-                    "description": "Use cool roof technology or reflective coating to reduce heat absorption",
-                    "category": "infrastructure",
-                    "priority": "medium",
-                    "estimated_cost": 3500,
-                    "impact_score": 70,
-                    "timeframe": "medium-term"
-                },
-                {
-                    "title": "Plant Shade Trees",
-                    "description": "Plant trees strategically to provide natural cooling and shade",
-                    "category": "landscaping",
-                    "priority": "medium",
-                    "estimated_cost": 400,
-                    "impact_score": 65,
-                    "timeframe": "long-term"
-                },
-                {
-                    "title": "Upgrade HVAC System",
-                    "description": "Install energy-efficient air conditioning with backup power",
-                    "category": "infrastructure",
-                    "priority": "high",
-                    "estimated_cost": 5000,
-                    "impact_score": 85,
-                    "timeframe": "medium-term"
-                }
-            ],
-            "sea_level_rise": [
-                {
-                    "title": "Elevate Property",
-                    "description": "Raise foundation or consider relocation for long-term protection",
-                    "category": "infrastructure",
-                    "priority": "high",
-                    "estimated_cost": 15000,
-                    "impact_score": 90,
-                    "timeframe": "long-term"
-                },
-                {
-                    "title": "Install Coastal Barriers",
-                    "description": "Build seawalls or living shorelines for erosion protection",
-                    "category": "infrastructure",
-                    "priority": "high",
-                    "estimated_cost": 10000,
-                    "impact_score": 80,
-                    "timeframe": "medium-term"
-                },
-                {
-                    "title": "Improve Drainage Systems",
-                    "description": "Install pumps and enhanced drainage to manage water intrusion",
-                    "category": "infrastructure",
-                    "priority": "medium",
-                    "estimated_cost": 3000,
-                    "impact_score": 70,
-                    "timeframe": "short-term"
-                },
-                {
-                    "title": "Review Insurance Coverage",
-                    "description": "Ensure adequate flood and coastal property insurance",
-                    "category": "financial",
-                    "priority": "critical",
-                    "estimated_cost": 1500,
-                    "impact_score": 85,
-                    "timeframe": "immediate"
-                }
-            ]
+            risk_type: {
+                band: self._sorted_actions(a for a in actions if a["priority"] in priorities)
+                for band, _, priorities in SCORE_BANDS
+            }
+            for risk_type, actions in action_database.items()
         }
     
+    def _sorted_actions(self, actions: Iterable[Dict]) -> Tuple[Dict, ...]:
+        """Actions in plan order (priority, then impact, both descending)"""
+        return tuple(sorted(actions, key=_priority_key, reverse=True))
+    
     def _get_actions_for_risk(
         self,
         risk_type: str,
         risk_score: float,
         user_profile: Dict = None
-    ) -> List[Dict]:
-        """Get actions for specific risk type"""
-        actions = self.action_database.get(risk_type, [])
-        
-        # Filter actions based on risk score
-        if risk_score > 70:
-            # High risk - include all actions
-            return actions.copy()
-        elif risk_score > 40:
-            # Moderate risk - prioritize critical and high priority
-            return [a for a in actions if a["priority"] in ["critical", "high"]]
-        else:
-            # Low risk - only critical actions
-            return [a for a in actions if a["priority"] == "critical"]
+    ) -> Tuple[Dict, ...]:
+        """Get presorted actions for specific risk type and score band"""
+        bands = self.action_index.get(risk_type)
+        if bands is None:
+            return ()
+        return bands[score_band(risk_score)]
     
-    def _get_general_preparedness_actions(self, risk_level: str) -> List[Dict]:
+    def _get_general_preparedness_actions(self, risk_level: str) -> Tuple[Dict, ...]:
         """Get general preparedness actions"""
-        general_actions = [
-            {
-                "title": "Create Emergency Plan",
-                "description": "Develop a family emergency plan with evacuation routes and meeting points",
-                "category": "preparedness",
-                "priority": "critical",
-                "estimated_cost": 0,
-                "impact_score": 85,
-                "timeframe": "immediate"
-            },
-            {
-                "title": "Build Emergency Kit",
-                "description": "Assemble emergency supplies: water, food, first aid, flashlight, radio",
-                "category": "preparedness",
-                "priority": "critical",
-                "estimated_cost": 150,
-                "impact_score": 90,
-                "timeframe": "immediate"
-            },
-            {
-                "title": "Document Property",
-                "description": "Take photos/videos of property and belongings for insurance purposes",
-                "category": "preparedness",
-                "priority": "high",
-                "estimated_cost": 0,
-                "impact_score": 70,
-                "timeframe": "immediate"
-            }
-        ]
-        
-        return general_actions
+        return self.general_actions
     
     def _prioritize_actions(self, actions: List[Dict], risk_level: str) -> List[Dict]:
         """Prioritize actions based on impact and urgency"""
-        priority_order = {"critical": 4, "high": 3, "medium": 2, "low": 1}
-        
-        # Sort by priority and impact score
-        sorted_actions = sorted(
-            actions,
-            key=lambda x: (priority_order.get(x["priority"], 0), x["impact_score"]),
-            reverse=True
-        )
-        
-        return sorted_actions
+        return list(self._sorted_actions(actions))
+    
+    def _merge_prioritized(self, action_lists: Sequence[Sequence[Dict]]) -> List[Dict]:
+        """Merge presorted action lists; ties keep list order, as a stable sort would"""
+        if len(action_lists) == 1:
+            return list(action_lists[0])
+        # Timsort detects the presorted runs and merges them natively, which
+        # beats a Python-level heap merge for lists this short
+        return sorted(itertools.chain.from_iterable(action_lists), key=_priority_key, reverse=True)
     
     def _generate_timeline(self, actions: List[Dict]) -> Dict[str, List[str]]:
         """Generate implementation timeline"""
@@ -0,0 +1,131 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from models.action_catalog import TIMEFRAME_ORDER
+
+# Budget resolution for the knapsack table; costs are rounded up to this grid
+DEFAULT_BUDGET_CELLS = 2000
+
+def allowed_timeframes(
+    timeframes: Optional[Iterable[str]] = None,
+    max_timeframe: Optional[str] = None
+) -> Optional[set]:
+    """Timeframes a plan may use, or None when unconstrained"""
+    allowed = None
+    if timeframes:
+        allowed = set(timeframes)
+    if max_timeframe:
+        if max_timeframe not in TIMEFRAME_ORDER:
+            raise ValueError(f"Unknown timeframe: {max_timeframe}")
+        horizon = set(TIMEFRAME_ORDER[:TIMEFRAME_ORDER.index(max_timeframe) + 1])
+        allowed = horizon if allowed is None else allowed & horizon
+    return allowed
+
+def dedupe_actions(actions: Iterable[Dict]) -> List[Dict]:
+    """Drop repeated actions (same title) suggested for several risk types, keeping the first"""
+    seen = set()
+    unique = []
+    for action in actions:
+        if action["title"] not in seen:
+            seen.add(action["title"])
+            unique.append(action)
+    return unique
+
+def select_within_budget(
+    actions: Sequence[Dict],
+    budget: float,
+    cells: int = DEFAULT_BUDGET_CELLS
+) -> List[Dict]:
+    """Pick the actions with the highest total impact_score whose total cost fits the budget
+
+    0/1 knapsack. Actions whose inclusion or exclusion is settled by the LP
+    bound (Dembo-Hammer reduction) are fixed up front, and only the remaining
+    core goes through the dynamic program, which keeps large catalogs fast.
+    Selected actions keep their input order.
+    """
+    free = [i for i, a in enumerate(actions) if a["estimated_cost"] <= 0]
+    paid = [i for i, a in enumerate(actions) if 0 < a["estimated_cost"] <= budget]
+    costs = np.array([actions[i]["estimated_cost"] for i in paid], dtype=float)
+    values = np.array([actions[i]["impact_score"] for i in paid], dtype=float)
+
+    if costs.sum() <= budget:
+        chosen = free + paid
+    else:
+        fixed_in, core = _reduce(costs, values, budget)
+        residual = budget - costs[fixed_in].sum()
+        picked = core[_knapsack(costs[core], values[core], residual, cells)]
+        chosen = free + [paid[i] for i in np.concatenate([fixed_in, picked]).tolist()]
+
+    return [actions[i] for i in sorted(chosen)]
+
+def _reduce(costs: np.ndarray, values: np.ndarray, budget: float):
+    """Split items into those certainly in an optimal solution and the undecided core
+
+    Uses the break item's efficiency r as a Lagrange multiplier: forcing item j
+    against the sign of its reduced value v_j - r*w_j lowers the bound by at
+    least |v_j - r*w_j|, so if that falls below the greedy solution the item
+    is fixed.
+    """
+    order = np.argsort(-values / costs, kind="stable")
+    fits = int(np.searchsorted(np.cumsum(costs[order]), budget, side="right"))
+    breaking = order[fits]
+    ratio = values[breaking] / costs[breaking]
+
+    reduced = values - ratio * costs
+    upper = ratio * budget + reduced[reduced > 0].sum()
+    lower = values[order[:fits]].sum()
+    fixed = np.abs(reduced) > (upper - lower) + 1e-9
+
+    fixed_in = np.flatnonzero(fixed & (reduced > 0))
+    core = np.flatnonzero(~fixed)
+    return fixed_in, core
+
+def _knapsack(costs: np.ndarray, values: np.ndarray, budget: float, cells: int) -> np.ndarray:
+    """Exact-on-grid 0/1 knapsack by dynamic programming, one vectorized row per item
+
+    Costs are rounded up to a grid of at most `cells` steps, so the result
+    never exceeds the budget; it is exact for whole-dollar costs when the
+    budget is at most `cells`.
+    """
+    if len(costs) == 0 or budget <= 0:
+        return np.array([], dtype=int)
+    unit = max(1.0, budget / cells)
+    capacity = int(budget / unit)
+    weights = np.ceil(costs / unit - 1e-9).astype(int)
+
+    best = np.zeros(capacity + 1)
+    take = np.zeros((len(costs), capacity + 1), dtype=bool)
+    for row, (weight, value) in enumerate(zip(weights.tolist(), values.tolist())):
+        if weight > capacity:
+            continue
+        candidate = best[:capacity + 1 - weight] + value
+        better = candidate > best[weight:]
+        take[row, weight:] = better
+        best[weight:] = np.where(better, candidate, best[weight:])
+
+    picked = []
+    remaining = capacity
+    for row in range(len(costs) - 1, -1, -1):
+        if take[row, remaining]:
+            picked.append(row)
+            remaining -= weights[row]
+    return np.array(picked, dtype=int)
+
+def optimize_actions(actions: Sequence[Dict], user_profile: Dict[str, Any]) -> List[Dict]:
+    """Apply a user profile's budget and timeframe constraints to prioritized actions
+
+    Recognized profile keys: budget, timeframes (allowed list), max_timeframe.
+    """
+    try:
+        budget = float(user_profile["budget"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid budget: {user_profile['budget']}")
+    if budget < 0:
+        raise ValueError("Budget must not be negative")
+
+    allowed = allowed_timeframes(user_profile.get("timeframes"), user_profile.get("max_timeframe"))
+    candidates = dedupe_actions(
+        a for a in actions if allowed is None or a["timeframe"] in allowed
+    )
+    return select_within_budget(candidates, budget)
@@ -0,0 +1,54 @@
+from typing import Dict
+
+# Emission factors (kg CO2 per unit)
+EMISSION_FACTORS: Dict[str, Dict[str, float]] = {
+    "transportation": {
+        "car_petrol": 0.192,  # per km
+        "car_diesel": 0.171,  # per km
+        "car_electric": 0.053,  # per km
+        "bus": 0.089,  # per km
+        "train": 0.041,  # per km
+        "flight_short": 0.255,  # per km
+        "flight_long": 0.195,  # per km
+        "motorcycle": 0.113,  # per km
+    },
+    "energy": {
+        "electricity": 0.475,  # per kWh
+        "natural_gas": 0.185,  # per kWh
+        "heating_oil": 0.264,  # per kWh
+        "coal": 0.340,  # per kWh
+        "solar": 0.045,  # per kWh
+        "wind": 0.011,  # per kWh
+    },
+    "food": {
+        "beef": 27.0,  # per kg
+        "pork": 12.1,  # per kg
+        "chicken": 6.9,  # per kg
+        "fish": 5.1,  # per kg
+        "dairy": 1.9,  # per kg
+        "vegetables": 0.4,  # per kg
+        "fruits": 0.3,  # per kg
+        "grains": 0.5,  # per kg
+    },
+    "goods": {
+        "clothing": 6.5,  # per item
+        "electronics": 85.0,  # per item
+        "furniture": 150.0,  # per item
+        "paper": 1.2,  # per kg
+        "plastic": 6.0,  # per kg
+    }
+}
+
+def get_equivalent(emissions_kg: float) -> str:
+    """Generate relatable equivalent for emissions"""
+    # Trees needed to offset for a year (one tree absorbs ~21 kg CO2/year)
+    trees = emissions_kg / 21
+    
+    # Equivalent car miles (average car emits 0.192 kg/km)
+    km = emissions_kg / 0.192
+    miles = km * 0.621371
+    
+    if trees < 1:
+        return f"Equivalent to {round(miles, 1)} miles driven by car"
+    else:
+        return f"Requires {round(trees, 1)} trees for one year to offset"
@@ -0,0 +1,198 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+PREDICTION_RISK_TYPES = ("flood", "wildfire", "hurricane", "drought", "heatwave", "sea_level_rise")
+
+# Per risk type: score at year 0, increase per year, +/- uniform noise
+RISK_BASELINE = np.array([30.0, 25.0, 20.0, 28.0, 35.0, 15.0])
+RISK_ANNUAL_INCREASE = np.array([2.5, 3.0, 2.0, 2.8, 3.5, 1.5])
+RISK_NOISE = np.array([5.0, 5.0, 5.0, 5.0, 5.0, 3.0])
+
+TEMPERATURE_TREND = 0.15  # ~1.5°C per decade
+TEMPERATURE_NOISE = 0.5
+PRECIPITATION_RANGE = (-10.0, 20.0)  # percentage
+SEA_LEVEL_RISE_MM = 3.3  # per year average
+
+def make_rng(seed: Optional[int] = None) -> np.random.Generator:
+    """Random generator for simulations; a seed makes results reproducible"""
+    return np.random.default_rng(seed)
+
+def simulate_predictions(
+    years: int,
+    rng: np.random.Generator,
+    batch_shape: Tuple[int, ...] = ()
+) -> Dict[str, np.ndarray]:
+    """Simulate a whole prediction horizon at once (simplified climate model)
+
+    Every array has shape batch_shape + (years,), except risk_scores which
+    adds a trailing risk-type axis ordered as PREDICTION_RISK_TYPES. The
+    batch axes can hold locations, ensemble members or both.
+    """
+    shape = tuple(batch_shape) + (years,)
+    return _project(
+        np.arange(1, years + 1, dtype=float),
+        rng.uniform(-TEMPERATURE_NOISE, TEMPERATURE_NOISE, shape),
+        rng.uniform(*PRECIPITATION_RANGE, shape),
+        rng.uniform(-1.0, 1.0, shape + (len(PREDICTION_RISK_TYPES),))
+    )
+
+def _project(
+    offsets: np.ndarray,
+    temperature_noise: np.ndarray,
+    precipitation_change: np.ndarray,
+    risk_noise: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """Apply the trend model to drawn noise (risk_noise in [-1, 1], scaled per risk type)"""
+    shape = temperature_noise.shape
+    temperature_change = TEMPERATURE_TREND * offsets + temperature_noise
+    extreme_events = np.broadcast_to(np.minimum(10 + offsets * 2, 40), shape)
+    sea_level = np.broadcast_to(SEA_LEVEL_RISE_MM * offsets, shape)
+    risk_scores = np.minimum(
+        RISK_BASELINE + offsets[:, None] * RISK_ANNUAL_INCREASE + risk_noise * RISK_NOISE,
+        100
+    )
+
+    return {
+        "temperature_change": temperature_change,
+        "precipitation_change_percent": precipitation_change,
+        "extreme_events_probability": extreme_events,
+        "sea_level_rise_mm": sea_level,
+        "risk_scores": risk_scores,
+        "overall_risk": risk_scores.mean(axis=-1)
+    }
+
+def round_predictions(simulation: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Round to the precision the API reports (and trends are computed from)"""
+    return {
+        "temperature_change": np.round(simulation["temperature_change"], 2),
+        "precipitation_change_percent": np.round(simulation["precipitation_change_percent"], 1),
+        "extreme_events_probability": np.round(simulation["extreme_events_probability"], 1),
+        "sea_level_rise_mm": np.round(simulation["sea_level_rise_mm"], 1),
+        "risk_scores": np.round(simulation["risk_scores"], 1),
+        "overall_risk": np.round(simulation["overall_risk"], 1)
+    }
+
+def analyze_trends(predictions: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Summarize one location's (rounded) prediction arrays"""
+    temperature = predictions["temperature_change"]
+    overall_risk = predictions["overall_risk"]
+    sea_level = predictions["sea_level_rise_mm"]
+    extreme_events = predictions["extreme_events_probability"]
+    annual_rate = np.diff(sea_level).mean() if len(sea_level) > 1 else sea_level[0]
+
+    return {
+        "temperature": {
+            "average_increase": round(float(temperature.mean()), 2),
+            "total_increase": round(float(temperature[-1]), 2),
+            "trend": "increasing"
+        },
+        "overall_risk": {
+            "current": round(float(overall_risk[0]), 1),
+            "future": round(float(overall_risk[-1]), 1),
+            "increase_percent": round(float((overall_risk[-1] - overall_risk[0]) / overall_risk[0] * 100), 1)
+        },
+        "sea_level": {
+            "total_rise_mm": round(float(sea_level[-1]), 1),
+            "annual_rate": round(float(annual_rate), 2)
+        },
+        "extreme_events": {
+            "probability_increase": round(float(extreme_events[-1] - extreme_events[0]), 1),
+            "trend": "increasing"
+        }
+    }
+
+def risk_progression(predictions: Dict[str, np.ndarray]) -> Dict[str, List[float]]:
+    """Risk score per year for each risk type"""
+    scores = predictions["risk_scores"]
+    return {
+        risk_type: scores[:, i].tolist()
+        for i, risk_type in enumerate(PREDICTION_RISK_TYPES)
+    }
+
+def predictions_to_json(predictions: Dict[str, np.ndarray], base_year: int) -> List[Dict[str, Any]]:
+    """Per-year prediction records for one location"""
+    columns = {
+        name: predictions[name].tolist()
+        for name in (
+            "temperature_change", "precipitation_change_percent",
+            "extreme_events_probability", "sea_level_rise_mm", "overall_risk"
+        )
+    }
+    scores = predictions["risk_scores"].tolist()
+    return [
+        {
+            "temperature_change": columns["temperature_change"][i],
+            "precipitation_change_percent": columns["precipitation_change_percent"][i],
+            "extreme_events_probability": columns["extreme_events_probability"][i],
+            "sea_level_rise_mm": columns["sea_level_rise_mm"][i],
+            "risk_scores": dict(zip(PREDICTION_RISK_TYPES, scores[i])),
+            "overall_risk": columns["overall_risk"][i],
+            "year": base_year + i + 1
+        }
+        for i in range(len(scores))
+    ]
+
+ENSEMBLE_PERCENTILES = (5, 50, 95)
+
+# Variables that vary between ensemble members (the rest are deterministic trends)
+_STOCHASTIC_VARIABLES = ("temperature_change", "precipitation_change_percent", "risk_scores", "overall_risk")
+
+def simulate_ensemble(
+    years: int,
+    simulations: int,
+    seed: int,
+    location_index: int = 0,
+    memory_budget_bytes: int = 256 * 1024 * 1024
+) -> Dict[str, np.ndarray]:
+    """Run a Monte Carlo ensemble and return percentile bands per year
+
+    Stochastic variables come back with a leading ENSEMBLE_PERCENTILES axis
+    (risk_scores: percentiles x years x risk types); deterministic ones are
+    plain per-year arrays. Years are simulated in blocks sized to the memory
+    budget. Each (location, year) draws from its own seeded stream, so the
+    result depends only on the seed, not on the block size or the process
+    it ran in.
+    """
+    # Samples plus roughly two temporaries per stochastic value
+    bytes_per_year = simulations * (len(PREDICTION_RISK_TYPES) + 3) * 8 * 3
+    block = int(max(1, min(years, memory_budget_bytes // bytes_per_year)))
+    streams = np.random.SeedSequence(seed, spawn_key=(location_index,)).spawn(years)
+    offsets = np.arange(1, years + 1, dtype=float)
+
+    bands = {
+        name: np.empty((len(ENSEMBLE_PERCENTILES), years))
+        for name in _STOCHASTIC_VARIABLES
+    }
+    bands["risk_scores"] = np.empty((len(ENSEMBLE_PERCENTILES), years, len(PREDICTION_RISK_TYPES)))
+
+    for start in range(0, years, block):
+        stop = min(start + block, years)
+        generators = [np.random.default_rng(stream) for stream in streams[start:stop]]
+        samples = _project(
+            offsets[start:stop],
+            np.stack([g.uniform(-TEMPERATURE_NOISE, TEMPERATURE_NOISE, simulations) for g in generators], axis=1),
+            np.stack([g.uniform(*PRECIPITATION_RANGE, simulations) for g in generators], axis=1),
+            np.stack([g.uniform(-1.0, 1.0, (simulations, len(PREDICTION_RISK_TYPES))) for g in generators], axis=1)
+        )
+        for name in _STOCHASTIC_VARIABLES:
+            bands[name][:, start:stop] = np.percentile(samples[name], ENSEMBLE_PERCENTILES, axis=0)
+
+    bands["extreme_events_probability"] = np.minimum(10 + offsets * 2, 40)
+    bands["sea_level_rise_mm"] = SEA_LEVEL_RISE_MM * offsets
+    return bands
+
+def ensemble_to_json(bands: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Percentile bands as {"p5": [...], "p50": [...], "p95": [...]} per variable"""
+    labels = [f"p{p}" for p in ENSEMBLE_PERCENTILES]
+    result = {}
+    for name in ("temperature_change", "precipitation_change_percent", "overall_risk"):
+        decimals = 2 if name == "temperature_change" else 1
+        result[name] = dict(zip(labels, np.round(bands[name], decimals).tolist()))
+    scores = np.round(bands["risk_scores"], 1)
+    result["risk_scores"] = {
+        risk_type: dict(zip(labels, scores[:, :, i].tolist()))
+        for i, risk_type in enumerate(PREDICTION_RISK_TYPES)
+    }
+    result["extreme_events_probability"] = np.round(bands["extreme_events_probability"], 1).tolist()
+    result["sea_level_rise_mm"] = np.round(bands["sea_level_rise_mm"], 1).tolist()
+    return result
@@ -1,7 +1,11 @@
 import numpy as np
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Sequence
 from datetime import datetime
 import json
+import warnings
+
+# Hazard order shared by the scalar and batch paths (column order of score matrices)
+RISK_TYPES = ("flood", "wildfire", "hurricane", "drought", "heatwave", "sea_level_rise")
 
 class RiskAssessmentAI:
     """AI model for climate risk assessment"""
@@ -63,7 +67,228 @@ class RiskAssessmentAI:
             "assessment_date": datetime.utcnow().isoformat(),
             "confidence": self._calculate_confidence(climate_data, historical_data)
         }
-    
+
+    def assess_risk_batch(
+        self,
+        locations: Sequence[str],
+        lat: Sequence[float],
+        lon: Sequence[float],
+        temperature: Sequence[float],
+        humidity: Sequence[float],
+        pressure: Sequence[float],
+        wind_speed: Sequence[float],
+        historical_precipitation: Optional[np.ndarray] = None,
+        temperature_increasing: Optional[Sequence[bool]] = None,
+        has_history: Optional[Sequence[bool]] = None
+    ) -> List[Dict[str, Any]]:
+        """Assess climate risks for many locations at once
+
+        Takes columnar inputs (one entry per location) and returns the same
+        dicts as calling assess_risk for each location in turn.
+        historical_precipitation is an (n, months) array of monthly totals in
+        chronological order, padded with NaN for shorter histories. has_history
+        marks rows whose historical payload was present (even if empty) and
+        defaults to rows with at least one value.
+        """
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        n = lat.shape[0]
+        history = self._history_matrix(historical_precipitation, n)
+
+        scores = self.score_batch(
+            lat, lon, temperature, humidity, pressure, wind_speed,
+            history, temperature_increasing
+        )
+        overall = scores.mean(axis=1)
+        levels = self._get_risk_levels(overall)
+        # Stable sort keeps the scalar tie-breaking order (hazard declaration order)
+        top_idx = np.argsort(-scores, axis=1, kind="stable")[:, :3]
+        confidence = self._calculate_confidence_batch(history, has_history)
+
+        assessment_date = datetime.utcnow().isoformat()
+        score_rows = scores.tolist()
+        overall_list = overall.tolist()
+        lat_list = lat.tolist()
+        lon_list = lon.tolist()
+        confidence_list = confidence.tolist()
+
+        results = []
+        for i in range(n):
+            row = score_rows[i]
+            results.append({
+                "location": locations[i],
+                "latitude": lat_list[i],
+                "longitude": lon_list[i],
+                "overall_risk_score": round(overall_list[i], 2),
+                "risk_level": levels[i],
+                "risk_breakdown": {k: round(v, 2) for k, v in zip(RISK_TYPES, row)},
+                "top_risks": [
+                    {"type": RISK_TYPES[j], "score": round(row[j], 2)} for j in top_idx[i].tolist()
+                ],
+                "assessment_date": assessment_date,
+                "confidence": confidence_list[i]
+            })
+        return results
+
+    def score_batch(
+        self,
+        lat: Sequence[float],
+        lon: Sequence[float],
+        temperature: Sequence[float],
+        humidity: Sequence[float],
+        pressure: Sequence[float],
+        wind_speed: Sequence[float],
+        historical_precipitation: Optional[np.ndarray] = None,
+        temperature_increasing: Optional[Sequence[bool]] = None
+    ) -> np.ndarray:
+        """Compute the (n, 6) hazard score matrix, columns ordered as RISK_TYPES"""
+        lat = np.asarray(lat, dtype=float)
+        n = lat.shape[0]
+        temp = np.asarray(temperature, dtype=float)
+        hum = np.asarray(humidity, dtype=float)
+        pres = np.asarray(pressure, dtype=float)
+        wind = np.asarray(wind_speed, dtype=float)
+        history = self._history_matrix(historical_precipitation, n)
+        if temperature_increasing is None:
+            warming = np.zeros(n, dtype=bool)
+        else:
+            warming = np.asarray(temperature_increasing, dtype=bool)
+
+        abs_lat = np.abs(lat)
+        # Rows without history average to NaN, which fails every threshold like the scalar path
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            avg_precip_3 = np.nanmean(history[:, :3], axis=1)
+            avg_precip_6 = np.nanmean(history[:, :6], axis=1)
+
+        scores = np.empty((n, len(RISK_TYPES)), dtype=np.int64)
+
+        # Flood
+        scores[:, 0] = (
+            20
+            + np.select([hum > 70, hum > 50], [30, 15], 0)
+            + np.where(abs_lat < 45, 10, 0)
+            + np.where(avg_precip_3 > 150, 20, 0)
+        )
+
+        # Wildfire
+        current_month = datetime.utcnow().month
+        if 6 <= current_month <= 9:
+            in_season = lat > 0
+        elif current_month <= 3 or current_month >= 11:
+            in_season = lat < 0
+        else:
+            in_season = np.zeros(n, dtype=bool)
+        scores[:, 1] = (
+            15
+            + np.select(
+                [(temp > 30) & (hum < 30), (temp > 25) & (hum < 40), temp > 20],
+                [40, 25, 10],
+                0
+            )
+            + np.select([wind > 10, wind > 5], [15, 8], 0)
+            + np.where(in_season, 10, 0)
+        )
+
+        # Hurricane
+        scores[:, 2] = (
+            10
+            + np.select([(abs_lat > 5) & (abs_lat < 30), abs_lat < 5], [30, 10], 5)
+            + np.where(temp > 26, 20, 0)
+            + np.where(pres < 1000, 25, 0)
+            + np.where(wind > 15, 15, 0)
+        )
+
+        # Drought
+        scores[:, 3] = (
+            20
+            + np.select([hum < 30, hum < 50], [30, 15], 0)
+            + np.select([avg_precip_6 < 50, avg_precip_6 < 100], [25, 10], 0)
+            + np.where(temp > 30, 15, 0)
+        )
+
+        # Heatwave
+        scores[:, 4] = (
+            15
+            + np.select([temp > 35, temp > 30, temp > 25], [40, 25, 10], 0)
+            + np.where((temp > 28) & (hum > 60), 20, 0)
+            + np.where(warming, 15, 0)
+        )
+
+        # Sea level rise
+        scores[:, 5] = (
+            10
+            + np.where(abs_lat < 60, 25, 0)
+            + np.where(warming, 20, 0)
+        )
+
+        return np.minimum(scores, 100)
+
+    def to_batch_columns(
+        self,
+        climate_data: Sequence[Dict[str, Any]],
+        historical_data: Sequence[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Convert per-location climate/historical dicts into assess_risk_batch columns
+
+        Missing fields fall back to the same defaults used by the scalar path.
+        """
+        histories = [
+            [d.get("total_precipitation", 0) for d in h["historical_data"]]
+            if h and "historical_data" in h else []
+            for h in historical_data
+        ]
+        months = max((len(h) for h in histories), default=0)
+        precipitation = np.full((len(histories), months), np.nan)
+        for i, h in enumerate(histories):
+            precipitation[i, :len(h)] = h
+
+        return {
+            "temperature": np.array([c.get("temperature", 15) for c in climate_data], dtype=float),
+            "humidity": np.array([c.get("humidity", 50) for c in climate_data], dtype=float),
+            "pressure": np.array([c.get("pressure", 1013) for c in climate_data], dtype=float),
+            "wind_speed": np.array([c.get("wind_speed", 0) for c in climate_data], dtype=float),
+            "historical_precipitation": precipitation,
+            "has_history": np.array(
+                [bool(h) and "historical_data" in h for h in historical_data], dtype=bool
+            ),
+            "temperature_increasing": np.array([
+                bool(h) and "trends" in h
+                and h["trends"].get("temperature_trend") == "increasing"
+                for h in historical_data
+            ], dtype=bool)
+        }
+
+    def _history_matrix(self, historical_precipitation: Optional[np.ndarray], n: int) -> np.ndarray:
+        """Normalise the historical precipitation input to an (n, months) float array"""
+        if historical_precipitation is None:
+            return np.empty((n, 0), dtype=float)
+        history = np.asarray(historical_precipitation, dtype=float)
+        if history.ndim == 1:
+            history = history.reshape(n, -1)
+        return history
+
+    def _get_risk_levels(self, scores: np.ndarray) -> List[str]:
+        """Vectorized _get_risk_level"""
+        levels = list(self.risk_thresholds.keys())
+        upper_bounds = [max_score for _, max_score in list(self.risk_thresholds.values())[:-1]]
+        idx = np.searchsorted(upper_bounds, scores, side="right")
+        return [levels[i] for i in idx.tolist()]
+
+    def _calculate_confidence_batch(
+        self,
+        history: np.ndarray,
+        has_history: Optional[Sequence[bool]] = None
+    ) -> np.ndarray:
+        """Vectorized _calculate_confidence for rows with climate data"""
+        months = (~np.isnan(history)).sum(axis=1)
+        if has_history is None:
+            has_history = months > 0
+        else:
+            has_history = np.asarray(has_history, dtype=bool)
+        confidence = 80 + np.select([months >= 12, has_history], [15, 5], 0)
+        return np.minimum(confidence, 95)
+
     def _assess_flood_risk(self, lat: float, lon: float, climate_data: Dict, historical_data: Dict) -> float:
         """Assess flood risk based on precipitation and location factors"""
         base_score = 20
@@ -0,0 +1,75 @@
+from typing import Dict, List, Tuple
+
+SCENARIO_NAMES: Tuple[str, ...] = ("optimistic", "moderate", "pessimistic")
+
+SCENARIOS: Dict[str, Dict] = {
+    "optimistic": {
+        "description": "Strong climate action, rapid transition to renewables",
+        "temperature_increase_2050": 1.5,
+        "sea_level_rise_2050_cm": 30,
+        "extreme_events_increase": "20%"
+    },
+    "moderate": {
+        "description": "Current policies continue, moderate climate action",
+        "temperature_increase_2050": 2.5,
+        "sea_level_rise_2050_cm": 50,
+        "extreme_events_increase": "40%"
+    },
+    "pessimistic": {
+        "description": "Limited climate action, high emissions continue",
+        "temperature_increase_2050": 4.0,
+        "sea_level_rise_2050_cm": 80,
+        "extreme_events_increase": "70%"
+    }
+}
+
+# Expected impacts per scenario
+SCENARIO_IMPACTS: Dict[str, List[str]] = {
+    "optimistic": [
+        "Manageable sea level rise",
+        "Reduced frequency of extreme weather",
+        "Stable agricultural productivity",
+        "Lower economic costs"
+    ],
+    "moderate": [
+        "Significant coastal flooding",
+        "Increased droughts and heatwaves",
+        "Agricultural challenges",
+        "Moderate economic disruption"
+    ],
+    "pessimistic": [
+        "Major coastal city flooding",
+        "Severe water scarcity",
+        "Widespread crop failures",
+        "Significant economic losses",
+        "Mass displacement of populations"
+    ]
+}
+
+# Recommendations per scenario
+SCENARIO_RECOMMENDATIONS: Dict[str, List[str]] = {
+    "optimistic": [
+        "Continue supporting renewable energy",
+        "Implement moderate adaptation measures",
+        "Monitor climate trends closely"
+    ],
+    "moderate": [
+        "Accelerate transition to renewables",
+        "Invest in resilient infrastructure",
+        "Develop comprehensive adaptation plans",
+        "Reduce personal carbon footprint"
+    ],
+    "pessimistic": [
+        "Urgent action on emissions reduction",
+        "Major infrastructure upgrades needed",
+        "Consider relocation from high-risk areas",
+        "Develop emergency response capabilities"
+    ]
+}
+
+# Columns of the scenario comparison matrix
+COMPARISON_METRICS: Tuple[str, ...] = (
+    "temperature_increase_2050",
+    "sea_level_rise_2050_cm",
+    "extreme_events_increase"
+)
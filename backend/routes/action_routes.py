@@ -1,9 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from services.database import get_session, ActionPlan
+from services.database import get_session, save, ActionPlan
+from services.http_cache import JSONPayload, payload_response
+from services.pagination import InvalidCursor, clamp_page_size, encode_cursor, keyset_before
 from models.action_model import action_planner_ai
 
 router = APIRouter()
@@ -22,6 +25,7 @@ class ActionPlanResponse(BaseModel):
     estimated_impact: float
     timeline: Dict[str, List[str]]
     generated_at: str
+    budget: Optional[float] = None
 
 @router.post("/generate", response_model=ActionPlanResponse)
 async def generate_action_plan(
@@ -33,11 +37,12 @@ async def generate_action_plan(
     
     - **location**: Location for action plan
     - **risk_assessment**: Risk assessment results
-    - **user_profile**: Optional user preferences and constraints
+    - **user_profile**: Optional user preferences and constraints; a `budget` (with optional
+      `timeframes` or `max_timeframe`) selects the highest-impact actions that fit it
     """
     try:
-        # Generate action plan
-        action_plan = action_planner_ai.generate_action_plan(
+        # Generate action plan (cached per risk profile, pre-serialized)
+        action_plan, body = action_planner_ai.generate_action_plan_body(
             risk_assessment=request.risk_assessment,
             user_profile=request.user_profile
         )
@@ -52,40 +57,25 @@ async def generate_action_plan(
             estimated_cost=action_plan["estimated_total_cost"],
             estimated_impact=action_plan["estimated_impact"]
         )
-        session.add(db_action_plan)
-        await session.commit()
+        await save(session, db_action_plan)
         
-        return action_plan
+        return Response(content=body, media_type="application/json")
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating action plan: {str(e)}")
 
+@router.get("/cache/stats")
+async def get_plan_cache_stats():
+    """Get action plan cache hit/miss counters"""
+    return action_planner_ai.plan_cache.stats()
+
 @router.get("/templates")
-async def get_action_templates():
-    """Get available action templates by category"""
+async def get_action_templates(request: Request):
+    """Get available action templates by category (cached, supports If-None-Match)"""
     try:
-        templates = action_planner_ai.action_database
-        
-        # Organize by category
-        categories = {}
-        for risk_type, actions in templates.items():
-            for action in actions:
-                category = action["category"]
-                if category not in categories:
-                    categories[category] = []
-                categories[category].append({
-                    "risk_type": risk_type,
-                    "title": action["title"],
-                    "description": action["description"],
-                    "estimated_cost": action["estimated_cost"],
-                    "impact_score": action["impact_score"]
-                })
-        
-        return {
-            "total_templates": sum(len(actions) for actions in templates.values()),
-            "risk_types": list(templates.keys()),
-            "categories": categories
-        }
+        return payload_response(request, _templates_payload())
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching templates: {str(e)}")
@@ -94,18 +84,36 @@ async def get_action_templates():
 async def get_user_action_plans(
     user_id: str,
     limit: int = 10,
+    cursor: Optional[str] = None,
     session: AsyncSession = Depends(get_session)
 ):
-    """Get action plans for a specific user"""
+    """
+    Get action plans for a specific user, newest first
+    
+    - **limit**: Page size (max 100)
+    - **cursor**: `next_cursor` from the previous page
+    """
     try:
-        from sqlalchemy import select
-        
-        query = select(ActionPlan).where(
-            ActionPlan.user_id == user_id
-        ).order_by(ActionPlan.created_at.desc()).limit(limit)
+        limit = clamp_page_size(limit)
+        query = select(
+            ActionPlan.id,
+            ActionPlan.location,
+            ActionPlan.priority,
+            func.json_array_length(ActionPlan.actions).label("total_actions"),
+            ActionPlan.estimated_cost,
+            ActionPlan.estimated_impact,
+            ActionPlan.created_at
+        ).where(ActionPlan.user_id == user_id)
+        if cursor:
+            query = query.where(keyset_before(ActionPlan.created_at, ActionPlan.id, cursor))
+        query = query.order_by(ActionPlan.created_at.desc(), ActionPlan.id.desc()).limit(limit + 1)
         
         result = await session.execute(query)
-        plans = result.scalars().all()
+        plans = result.all()
+        next_cursor = None
+        if len(plans) > limit:
+            plans = plans[:limit]
+            next_cursor = encode_cursor(plans[-1].created_at, plans[-1].id)
         
         return {
             "user_id": user_id,
@@ -115,14 +123,51 @@ async def get_user_action_plans(
                     "id": p.id,
                     "location": p.location,
                     "priority": p.priority,
-                    "total_actions": len(p.actions),
+                    "total_actions": p.total_actions or 0,
                     "estimated_cost": p.estimated_cost,
                     "estimated_impact": p.estimated_impact,
                     "created_at": p.created_at.isoformat()
                 }
                 for p in plans
-            ]
+            ],
+            "next_cursor": next_cursor
         }
         
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching user plans: {str(e)}")
+
+# (action_database the payload was built from, payload); rebuilt when the catalog is swapped
+_templates_cache: Tuple[Optional[Dict], Optional[JSONPayload]] = (None, None)
+
+def _templates_payload() -> JSONPayload:
+    global _templates_cache
+    templates = action_planner_ai.action_database
+    source, payload = _templates_cache
+    if source is templates:
+        return payload
+    
+    # Organize by category
+    categories = {}
+    for risk_type, actions in templates.items():
+        for action in actions:
+            category = action["category"]
+            if category not in categories:
+                categories[category] = []
+            categories[category].append({
+                "risk_type": risk_type,
+                "title": action["title"],
+                "description": action["description"],
+                "estimated_cost": action["estimated_cost"],
+                "impact_score": action["impact_score"]
+            })
+    
+    payload = JSONPayload({
+        "catalog_version": action_planner_ai.catalog.version,
+        "total_templates": sum(len(actions) for actions in templates.values()),
+        "risk_types": list(templates.keys()),
+        "categories": categories
+    })
+    _templates_cache = (templates, payload)
+    return payload
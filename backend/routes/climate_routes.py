@@ -3,7 +3,7 @@ from pydantic import BaseModel
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from services.database import get_session, ClimateData
+from services.database import get_session, save, ClimateData
 from services.climate_service import climate_service
 
 router = APIRouter()
@@ -40,8 +40,7 @@ async def get_current_climate(
             data_source="openweathermap",
             raw_data=data
         )
-        session.add(db_data)
-        await session.commit()
+        await save(session, db_data)
         
         return {
             "location": f"{latitude},{longitude}",
@@ -102,3 +101,8 @@ async def get_historical_climate(
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching historical data: {str(e)}")
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Get climate data cache hit/miss and request coalescing counters"""
+    return climate_service.cache_stats()
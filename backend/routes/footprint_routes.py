@@ -1,9 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, UploadFile, File
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List
+from datetime import datetime
+import numpy as np
+import anyio
+import asyncio
+import json
+import os
+import tempfile
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from services.database import get_session, CarbonFootprint
+from services.database import get_session, save, save_rows, CarbonFootprint, FootprintRollup
+from services.footprint_rollup import month_expression
+from services.http_cache import JSONPayload, payload_response
+from services.footprint_import import (
+    import_activity_file, parse_column_map, detect_format, DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE
+)
+from models.footprint_model import EMISSION_FACTORS, get_equivalent
 
 router = APIRouter()
 
@@ -23,44 +38,15 @@ class FootprintResponse(BaseModel):
     emissions_tons: float
     equivalent: str
 
-# Emission factors (kg CO2 per unit)
-EMISSION_FACTORS = {
-    "transportation": {
-        "car_petrol": 0.192,  # per km
-        "car_diesel": 0.171,  # per km
-        "car_electric": 0.053,  # per km
-        "bus": 0.089,  # per km
-        "train": 0.041,  # per km
-        "flight_short": 0.255,  # per km
-        "flight_long": 0.195,  # per km
-        "motorcycle": 0.113,  # per km
-    },
-    "energy": {
-        "electricity": 0.475,  # per kWh
-        "natural_gas": 0.185,  # per kWh
-        "heating_oil": 0.264,  # per kWh
-        "coal": 0.340,  # per kWh
-        "solar": 0.045,  # per kWh
-        "wind": 0.011,  # per kWh
-    },
-    "food": {
-        "beef": 27.0,  # per kg
-        "pork": 12.1,  # per kg
-        "chicken": 6.9,  # per kg
-        "fish": 5.1,  # per kg
-        "dairy": 1.9,  # per kg
-        "vegetables": 0.4,  # per kg
-        "fruits": 0.3,  # per kg
-        "grains": 0.5,  # per kg
-    },
-    "goods": {
-        "clothing": 6.5,  # per item
-        "electronics": 85.0,  # per item
-        "furniture": 150.0,  # per item
-        "paper": 1.2,  # per kg
-        "plastic": 6.0,  # per kg
-    }
-}
+class BatchFootprintResponse(BaseModel):
+    results: List[FootprintResponse]
+    total_items: int
+    total_emissions_kg: float
+    total_emissions_tons: float
+    equivalent: str
+
+# Largest number of activities accepted by /calculate/batch
+BATCH_MAX_ITEMS = int(os.getenv("FOOTPRINT_BATCH_MAX_ITEMS", 5000))
 
 @router.post("/calculate", response_model=FootprintResponse)
 async def calculate_footprint(
@@ -91,7 +77,7 @@ async def calculate_footprint(
         emissions_tons = emissions_kg / 1000
         
         # Create equivalent for context
-        equivalent = _get_equivalent(emissions_kg)
+        equivalent = get_equivalent(emissions_kg)
         
         # Save to database
         db_footprint = CarbonFootprint(
@@ -106,8 +92,7 @@ async def calculate_footprint(
                 "equivalent": equivalent
             }
         )
-        session.add(db_footprint)
-        await session.commit()
+        await save(session, db_footprint)
         
         return {
             "category": request.category,
@@ -124,21 +109,220 @@ async def calculate_footprint(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calculating footprint: {str(e)}")
 
+@router.post("/calculate/batch", response_model=BatchFootprintResponse)
+async def calculate_footprint_batch(
+    requests: List[FootprintCalculationRequest],
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Calculate carbon footprints for a list of activities
+    
+    Takes the same items as /calculate. All items are validated first; if
+    any is invalid nothing is stored and every problem is reported. Valid
+    batches are stored with a single bulk insert.
+    """
+    try:
+        if len(requests) > BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"Batch too large: maximum {BATCH_MAX_ITEMS} items")
+        
+        # Validate every item against the emission factors in one pass
+        errors = []
+        factors = []
+        for index, request in enumerate(requests):
+            activities = EMISSION_FACTORS.get(request.category)
+            if activities is None:
+                errors.append({"index": index, "detail": f"Invalid category: {request.category}"})
+            elif request.activity_type not in activities:
+                errors.append({"index": index, "detail": f"Invalid activity type: {request.activity_type}"})
+            else:
+                factors.append(activities[request.activity_type])
+        
+        if errors:
+            raise HTTPException(status_code=400, detail=errors)
+        
+        # Calculate emissions for the whole batch at once
+        factor_array = np.array(factors, dtype=float)
+        emissions = np.array([r.amount for r in requests], dtype=float) * factor_array
+        emissions_kg = emissions.tolist()
+        equivalents = [get_equivalent(e) for e in emissions_kg]
+        
+        now = datetime.utcnow()
+        await save_rows(session, CarbonFootprint, [
+            {
+                "user_id": request.user_id,
+                "category": request.category,
+                "activity_type": request.activity_type,
+                "amount": request.amount,
+                "emissions_kg": emissions_kg[i],
+                "calculation_data": {
+                    "emission_factor": factors[i],
+                    "unit": request.unit,
+                    "equivalent": equivalents[i]
+                },
+                "created_at": now
+            }
+            for i, request in enumerate(requests)
+        ])
+        
+        total_emissions = float(emissions.sum())
+        
+        return {
+            "results": [
+                {
+                    "category": request.category,
+                    "activity_type": request.activity_type,
+                    "amount": request.amount,
+                    "unit": request.unit,
+                    "emissions_kg": round(emissions_kg[i], 2),
+                    "emissions_tons": round(emissions_kg[i] / 1000, 4),
+                    "equivalent": equivalents[i]
+                }
+                for i, request in enumerate(requests)
+            ],
+            "total_items": len(requests),
+            "total_emissions_kg": round(total_emissions, 2),
+            "total_emissions_tons": round(total_emissions / 1000, 4),
+            "equivalent": get_equivalent(total_emissions)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating footprints: {str(e)}")
+
+@router.post("/import")
+async def import_footprints(
+    file: UploadFile = File(...),
+    user_id: Optional[str] = None,
+    category: Optional[str] = None,
+    columns: Optional[str] = None,
+    file_format: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+):
+    """
+    Import an activity log (CSV or Parquet) into carbon footprints
+    
+    - **file**: CSV or Parquet file with category, activity_type and amount columns
+    - **user_id**: Assign every row to this user instead of a user_id column
+    - **category**: Assign every row to this category instead of a category column
+    - **columns**: Optional mapping such as `amount=litres,category=fuel_type`
+    - **file_format**: `csv` or `parquet` (default: from the file name)
+    - **chunk_size**: Rows processed per chunk (max FOOTPRINT_IMPORT_MAX_CHUNK_SIZE)
+    
+    Streams NDJSON progress reports, one per chunk, ending with a line
+    that has `"done": true`.
+    """
+    try:
+        column_map = parse_column_map(columns.split(",")) if columns else {}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if file_format not in (None, "csv", "parquet"):
+        raise HTTPException(status_code=400, detail=f"Invalid file format: {file_format}")
+    if not 1 <= chunk_size <= MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail=f"chunk_size must be between 1 and {MAX_CHUNK_SIZE}")
+    
+    # The upload is closed once this handler returns, so spool it to a file
+    # owned by the streaming generator.
+    spool = tempfile.TemporaryFile()
+    while chunk := await file.read(1024 * 1024):
+        spool.write(chunk)
+    spool.seek(0)
+    file_format = file_format or detect_format(file.filename or "")
+    
+    async def stream():
+        reports: asyncio.Queue = asyncio.Queue()
+        
+        async def run():
+            try:
+                report = await import_activity_file(
+                    spool,
+                    file_format=file_format,
+                    column_map=column_map,
+                    user_id=user_id,
+                    category=category,
+                    chunk_size=chunk_size,
+                    progress=reports.put
+                )
+                await reports.put({**report, "done": True})
+            except Exception as e:
+                await reports.put({"done": True, "error": f"Error importing activities: {str(e)}"})
+        
+        task = asyncio.ensure_future(run())
+        try:
+            while True:
+                report = await reports.get()
+                yield json.dumps(report) + "\n"
+                if report.get("done"):
+                    break
+        finally:
+            task.cancel()
+            # Let the import stop reading the spool before closing it; shielded
+            # because a client disconnect keeps cancelling this generator
+            with anyio.CancelScope(shield=True):
+                await asyncio.gather(task, return_exceptions=True)
+            spool.close()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @router.get("/user/{user_id}/summary")
 async def get_user_footprint_summary(
     user_id: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    monthly: bool = False,
     session: AsyncSession = Depends(get_session)
 ):
-    """Get carbon footprint summary for user"""
+    """
+    Get carbon footprint summary for user
+    
+    Without a date range the summary is read from the per-month rollup
+    table; with one it is aggregated from the raw entries.
+    
+    - **start_date**: Optional inclusive lower bound on entry time
+    - **end_date**: Optional exclusive upper bound on entry time
+    - **monthly**: Include a per-month breakdown by category
+    """
     try:
-        from sqlalchemy import select, func
+        if start_date is None and end_date is None:
+            # Served from the incrementally maintained rollup table
+            query = select(
+                FootprintRollup.month,
+                FootprintRollup.category,
+                FootprintRollup.emissions_kg,
+                FootprintRollup.entries
+            ).where(FootprintRollup.user_id == user_id).order_by(FootprintRollup.month)
+        else:
+            filters = [CarbonFootprint.user_id == user_id]
+            if start_date is not None:
+                filters.append(CarbonFootprint.created_at >= start_date)
+            if end_date is not None:
+                filters.append(CarbonFootprint.created_at < end_date)
+            
+            # Aggregate the raw rows in the database
+            totals = (func.sum(CarbonFootprint.emissions_kg), func.count())
+            if monthly:
+                month = month_expression(CarbonFootprint.created_at)
+                query = (
+                    select(month, CarbonFootprint.category, *totals)
+                    .where(*filters)
+                    .group_by(month, CarbonFootprint.category)
+                    .order_by(month)
+                )
+            else:
+                query = (
+                    select(CarbonFootprint.category, *totals)
+                    .where(*filters)
+                    .group_by(CarbonFootprint.category)
+                )
         
-        # Get all user footprints
-        query = select(CarbonFootprint).where(CarbonFootprint.user_id == user_id)
         result = await session.execute(query)
-        footprints = result.scalars().all()
+        rows = result.all()
+        if (start_date is not None or end_date is not None) and not monthly:
+            # Per-category totals only; give them the same shape as the monthly rows
+            rows = [(None, category, total, count) for category, total, count in rows]
+        total_entries = sum(count for _, _, _, count in rows)
         
-        if not footprints:
+        if not total_entries:
             return {
                 "user_id": user_id,
                 "total_emissions_kg": 0,
@@ -147,49 +331,48 @@ async def get_user_footprint_summary(
                 "total_entries": 0
             }
         
-        # Calculate totals
-        total_emissions = sum(f.emissions_kg for f in footprints)
-        
-        # Group by category
         by_category = {}
-        for f in footprints:
-            if f.category not in by_category:
-                by_category[f.category] = 0
-            by_category[f.category] += f.emissions_kg
+        months = {}
+        for month_key, category, total, count in rows:
+            total = total or 0
+            by_category[category] = by_category.get(category, 0) + total
+            if monthly:
+                entry = months.setdefault(month_key, {"total_emissions_kg": 0, "total_entries": 0, "by_category": {}})
+                entry["total_emissions_kg"] += total
+                entry["total_entries"] += count
+                entry["by_category"][category] = round(total, 2)
         
-        return {
+        total_emissions = sum(by_category.values())
+        
+        summary = {
             "user_id": user_id,
             "total_emissions_kg": round(total_emissions, 2),
             "total_emissions_tons": round(total_emissions / 1000, 4),
             "by_category": {k: round(v, 2) for k, v in by_category.items()},
-            "total_entries": len(footprints),
-            "average_per_entry": round(total_emissions / len(footprints), 2)
+            "total_entries": total_entries,
+            "average_per_entry": round(total_emissions / total_entries, 2)
         }
         
+        if monthly:
+            for entry in months.values():
+                entry["total_emissions_kg"] = round(entry["total_emissions_kg"], 2)
+            summary["monthly"] = months
+        
+        return summary
+        
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching summary: {str(e)}")
 
-@router.get("/categories")
-async def get_footprint_categories():
-    """Get available categories and activity types"""
-    return {
-        "categories": list(EMISSION_FACTORS.keys()),
-        "details": {
-            category: list(activities.keys())
-            for category, activities in EMISSION_FACTORS.items()
-        }
+# Emission factors are static, so the categories body is serialized once
+CATEGORIES_PAYLOAD = JSONPayload({
+    "categories": list(EMISSION_FACTORS.keys()),
+    "details": {
+        category: list(activities.keys())
+        for category, activities in EMISSION_FACTORS.items()
     }
+})
 
-def _get_equivalent(emissions_kg: float) -> str:
-    """Generate relatable equivalent for emissions"""
-    # Trees needed to offset for a year (one tree absorbs ~21 kg CO2/year)
-    trees = emissions_kg / 21
-    
-    # Equivalent car miles (average car emits 0.192 kg/km)
-    km = emissions_kg / 0.192
-    miles = km * 0.621371
-    
-    if trees < 1:
-        return f"Equivalent to {round(miles, 1)} miles driven by car"
-    else:
-        return f"Requires {round(trees, 1)} trees for one year to offset"
+@router.get("/categories")
+async def get_footprint_categories(request: Request):
+    """Get available categories and activity types (cached, supports If-None-Match)"""
+    return payload_response(request, CATEGORIES_PAYLOAD)
@@ -1,15 +1,38 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Mapping
+from types import MappingProxyType
 import numpy as np
+import base64
+import json
+import os
 from datetime import datetime, timedelta
 
+from models.prediction_model import (
+    make_rng, simulate_predictions, round_predictions,
+    analyze_trends, risk_progression, predictions_to_json,
+    ENSEMBLE_PERCENTILES, PREDICTION_RISK_TYPES
+)
+from models.scenario_model import (
+    SCENARIO_NAMES, SCENARIOS, SCENARIO_IMPACTS, SCENARIO_RECOMMENDATIONS, COMPARISON_METRICS
+)
+from services.prediction_service import prediction_service
+
 router = APIRouter()
 
+MAX_PREDICTION_YEARS = int(os.getenv("PREDICTION_MAX_YEARS", 100))
+MAX_ENSEMBLE_SIMULATIONS = int(os.getenv("ENSEMBLE_MAX_SIMULATIONS", 100000))
+MAX_ENSEMBLE_LOCATIONS = int(os.getenv("ENSEMBLE_MAX_LOCATIONS", 500))
+MAX_GRID_POINTS = int(os.getenv("PREDICTION_GRID_MAX_POINTS", 10000))
+
+GRID_ENCODINGS = ("json", "base64", "arrow")
+
 class PredictionRequest(BaseModel):
     latitude: float
     longitude: float
     years: Optional[int] = 10
+    seed: Optional[int] = None
+    ensemble: Optional[int] = None
 
 class PredictionResponse(BaseModel):
     location: str
@@ -17,6 +40,25 @@ class PredictionResponse(BaseModel):
     predictions: List[Dict[str, Any]]
     trends: Dict[str, Any]
     risk_progression: Dict[str, List[float]]
+    ensemble: Optional[Dict[str, Any]] = None
+
+class Coordinate(BaseModel):
+    latitude: float
+    longitude: float
+
+class EnsembleRequest(BaseModel):
+    locations: List[Coordinate]
+    years: int = 30
+    simulations: int = 10000
+    seed: Optional[int] = None
+
+class GridPredictionRequest(BaseModel):
+    bbox: Optional[List[float]] = None  # [min_lat, min_lon, max_lat, max_lon]
+    resolution: float = 0.5  # degrees
+    coordinates: Optional[List[Coordinate]] = None
+    years: int = 10
+    seed: Optional[int] = None
+    encoding: str = "json"  # json, base64 or arrow
 
 @router.post("/generate", response_model=PredictionResponse)
 async def generate_predictions(request: PredictionRequest):
@@ -26,117 +68,223 @@ async def generate_predictions(request: PredictionRequest):
     - **latitude**: Latitude coordinate
     - **longitude**: Longitude coordinate
     - **years**: Number of years to predict (default: 10)
+    - **seed**: Optional random seed for reproducible predictions
+    - **ensemble**: Optional number of Monte Carlo simulations for p5/p50/p95 bands
     """
     try:
-        predictions = []
-        base_year = datetime.utcnow().year
+        _validate_horizon(request.years)
         
-        # Generate yearly predictions
-        for year_offset in range(1, request.years + 1):
-            year = base_year + year_offset
-            prediction = _generate_year_prediction(
-                request.latitude,
-                request.longitude,
-                year_offset
-            )
-            prediction["year"] = year
-            predictions.append(prediction)
+        # Simulate the whole horizon at once
+        rng = make_rng(request.seed)
+        predictions = round_predictions(simulate_predictions(request.years, rng))
         
-        # Analyze trends
-        trends = _analyze_trends(predictions)
-        
-        # Calculate risk progression
-        risk_progression = _calculate_risk_progression(predictions)
-        
-        return {
+        result = {
             "location": f"{request.latitude},{request.longitude}",
             "prediction_years": request.years,
-            "predictions": predictions,
-            "trends": trends,
-            "risk_progression": risk_progression
+            "predictions": predictions_to_json(predictions, datetime.utcnow().year),
+            "trends": analyze_trends(predictions),
+            "risk_progression": risk_progression(predictions)
         }
         
+        if request.ensemble:
+            _validate_ensemble(request.ensemble, 1)
+            ensemble = await prediction_service.run_ensemble(1, request.years, request.ensemble, request.seed)
+            result["ensemble"] = {
+                "simulations": request.ensemble,
+                "seed": ensemble["seed"],
+                "percentiles": list(ENSEMBLE_PERCENTILES),
+                "bands": ensemble["bands"][0]
+            }
+        
+        return result
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating predictions: {str(e)}")
 
-def _generate_year_prediction(lat: float, lon: float, year_offset: int) -> Dict[str, Any]:
-    """Generate prediction for a specific year"""
-    import random
-    
-    # Base temperature increase (simplified climate model)
-    base_temp_increase = 0.15 * year_offset  # ~1.5°C per decade
-    
-    # Add some variability
-    temp_variance = random.uniform(-0.5, 0.5)
-    temperature_change = base_temp_increase + temp_variance
-    
-    # Precipitation changes (more variable)
-    precip_change = random.uniform(-10, 20)  # percentage
-    
-    # Extreme events probability
-    extreme_events_probability = min(10 + (year_offset * 2), 40)  # increasing probability
+@router.post("/ensemble")
+async def generate_ensemble_predictions(request: EnsembleRequest):
+    """
+    Run Monte Carlo ensemble predictions for one or more locations
     
-    # Sea level rise (mm per year)
-    sea_level_rise = 3.3 * year_offset  # ~3.3mm per year average
+    - **locations**: List of {latitude, longitude}
+    - **years**: Number of years to predict (default: 30)
+    - **simulations**: Ensemble members per location (default: 10000)
+    - **seed**: Optional random seed; the seed used is returned for reproducibility
+    """
+    try:
+        _validate_horizon(request.years)
+        _validate_ensemble(request.simulations, len(request.locations))
+        
+        ensemble = await prediction_service.run_ensemble(
+            len(request.locations), request.years, request.simulations, request.seed
+        )
+        base_year = datetime.utcnow().year
+        
+        return {
+            "seed": ensemble["seed"],
+            "simulations": request.simulations,
+            "percentiles": list(ENSEMBLE_PERCENTILES),
+            "years": list(range(base_year + 1, base_year + request.years + 1)),
+            "locations": [
+                {
+                    "location": f"{location.latitude},{location.longitude}",
+                    "bands": bands
+                }
+                for location, bands in zip(request.locations, ensemble["bands"])
+            ]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating ensemble predictions: {str(e)}")
+
+@router.post("/grid")
+async def generate_grid_predictions(request: GridPredictionRequest):
+    """
+    Generate predictions for many points in one vectorized pass (for map layers)
     
-    # Risk scores
-    risk_scores = {
-        "flood": min(30 + (year_offset * 2.5) + random.uniform(-5, 5), 100),
-        "wildfire": min(25 + (year_offset * 3) + random.uniform(-5, 5), 100),
-        "hurricane": min(20 + (year_offset * 2) + random.uniform(-5, 5), 100),
-        "drought": min(28 + (year_offset * 2.8) + random.uniform(-5, 5), 100),
-        "heatwave": min(35 + (year_offset * 3.5) + random.uniform(-5, 5), 100),
-        "sea_level_rise": min(15 + (year_offset * 1.5) + random.uniform(-3, 3), 100)
-    }
+    - **bbox**: [min_lat, min_lon, max_lat, max_lon], sampled every **resolution** degrees
+    - **coordinates**: Explicit list of {latitude, longitude} instead of a bbox
+    - **years**: Number of years to predict (default: 10)
+    - **seed**: Optional random seed for reproducible predictions
+    - **encoding**: `json` (nested lists), `base64` (little-endian float32 matrices) or
+      `arrow` (Arrow IPC stream, one row per point)
     
-    return {
-        "temperature_change": round(temperature_change, 2),
-        "precipitation_change_percent": round(precip_change, 1),
-        "extreme_events_probability": round(extreme_events_probability, 1),
-        "sea_level_rise_mm": round(sea_level_rise, 1),
-        "risk_scores": {k: round(v, 1) for k, v in risk_scores.items()},
-        "overall_risk": round(np.mean(list(risk_scores.values())), 1)
-    }
+    Matrices are points x years, with points in latitude-major order.
+    """
+    try:
+        _validate_horizon(request.years)
+        if request.encoding not in GRID_ENCODINGS:
+            raise HTTPException(status_code=400, detail=f"encoding must be one of: {', '.join(GRID_ENCODINGS)}")
+        latitudes, longitudes = _grid_points(request)
+        
+        rng = make_rng(request.seed)
+        predictions = simulate_predictions(request.years, rng, batch_shape=(len(latitudes),))
+        matrices = {
+            "temperature_change": predictions["temperature_change"],
+            "precipitation_change_percent": predictions["precipitation_change_percent"],
+            "overall_risk": predictions["overall_risk"]
+        }
+        for i, risk_type in enumerate(PREDICTION_RISK_TYPES):
+            matrices[risk_type] = predictions["risk_scores"][..., i]
+        
+        base_year = datetime.utcnow().year
+        years = list(range(base_year + 1, base_year + request.years + 1))
+        
+        if request.encoding == "arrow":
+            return Response(
+                content=_arrow_grid(latitudes, longitudes, matrices, years),
+                media_type="application/vnd.apache.arrow.stream"
+            )
+        
+        if request.encoding == "base64":
+            values = {
+                name: {
+                    "dtype": "float32",
+                    "shape": list(matrix.shape),
+                    "data": base64.b64encode(matrix.astype("<f4").tobytes()).decode()
+                }
+                for name, matrix in matrices.items()
+            }
+        else:
+            values = {name: np.round(matrix, 1).tolist() for name, matrix in matrices.items()}
+        
+        result = {
+            "count": len(latitudes),
+            "years": years,
+            "risk_types": list(PREDICTION_RISK_TYPES),
+            "encoding": request.encoding,
+            "latitudes": latitudes.tolist(),
+            "longitudes": longitudes.tolist(),
+            "values": values,
+            # Same for every point in this model
+            "extreme_events_probability": np.round(predictions["extreme_events_probability"][0], 1).tolist(),
+            "sea_level_rise_mm": np.round(predictions["sea_level_rise_mm"][0], 1).tolist()
+        }
+        # Serialized directly: the generic encoder walks every nested list element
+        return Response(
+            content=json.dumps(result, separators=(",", ":")).encode(),
+            media_type="application/json"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating grid predictions: {str(e)}")
 
-def _analyze_trends(predictions: List[Dict]) -> Dict[str, Any]:
-    """Analyze trends from predictions"""
-    temp_changes = [p["temperature_change"] for p in predictions]
-    overall_risks = [p["overall_risk"] for p in predictions]
-    sea_levels = [p["sea_level_rise_mm"] for p in predictions]
+def _grid_points(request: GridPredictionRequest):
+    """Point coordinates from an explicit list or a bbox sampled at the resolution"""
+    if request.coordinates:
+        latitudes = np.array([c.latitude for c in request.coordinates])
+        longitudes = np.array([c.longitude for c in request.coordinates])
+    elif request.bbox:
+        if len(request.bbox) != 4 or request.resolution <= 0:
+            raise HTTPException(status_code=400, detail="bbox must be [min_lat, min_lon, max_lat, max_lon] with a positive resolution")
+        min_lat, min_lon, max_lat, max_lon = request.bbox
+        if min_lat > max_lat or min_lon > max_lon:
+            raise HTTPException(status_code=400, detail="bbox minimums must not exceed maximums")
+        rows = int(np.floor((max_lat - min_lat) / request.resolution + 1e-9)) + 1
+        cols = int(np.floor((max_lon - min_lon) / request.resolution + 1e-9)) + 1
+        if rows * cols > MAX_GRID_POINTS:
+            raise HTTPException(status_code=400, detail=f"Grid has {rows * cols} points; at most {MAX_GRID_POINTS} are allowed")
+        lat_axis = np.round(min_lat + request.resolution * np.arange(rows), 6)
+        lon_axis = np.round(min_lon + request.resolution * np.arange(cols), 6)
+        latitudes = np.repeat(lat_axis, cols)
+        longitudes = np.tile(lon_axis, rows)
+    else:
+        raise HTTPException(status_code=400, detail="Provide either bbox or coordinates")
     
-    return {
-        "temperature": {
-            "average_increase": round(np.mean(temp_changes), 2),
-            "total_increase": round(temp_changes[-1], 2),
-            "trend": "increasing"
-        },
-        "overall_risk": {
-            "current": round(overall_risks[0], 1),
-            "future": round(overall_risks[-1], 1),
-            "increase_percent": round(((overall_risks[-1] - overall_risks[0]) / overall_risks[0]) * 100, 1)
-        },
-        "sea_level": {
-            "total_rise_mm": round(sea_levels[-1], 1),
-            "annual_rate": round(np.mean(np.diff(sea_levels)), 2)
-        },
-        "extreme_events": {
-            "probability_increase": round(predictions[-1]["extreme_events_probability"] - predictions[0]["extreme_events_probability"], 1),
-            "trend": "increasing"
-        }
-    }
+    if not 1 <= len(latitudes) <= MAX_GRID_POINTS:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {MAX_GRID_POINTS} points are allowed")
+    return latitudes, longitudes
 
-def _calculate_risk_progression(predictions: List[Dict]) -> Dict[str, List[float]]:
-    """Calculate risk progression over time"""
-    risk_types = ["flood", "wildfire", "hurricane", "drought", "heatwave", "sea_level_rise"]
+def _arrow_grid(
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    matrices: Dict[str, np.ndarray],
+    years: List[int]
+) -> bytes:
+    """Arrow IPC stream: latitude, longitude and a fixed-size float32 list per variable"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise HTTPException(status_code=400, detail="Arrow encoding requires the 'pyarrow' package")
     
-    progression = {}
-    for risk_type in risk_types:
-        progression[risk_type] = [
-            round(p["risk_scores"][risk_type], 1)
-            for p in predictions
-        ]
+    columns = {"latitude": pa.array(latitudes), "longitude": pa.array(longitudes)}
+    for name, matrix in matrices.items():
+        flat = pa.array(matrix.astype(np.float32).ravel())
+        columns[name] = pa.FixedSizeListArray.from_arrays(flat, len(years))
+    table = pa.table(columns).replace_schema_metadata({
+        "years": json.dumps(years),
+        "risk_types": json.dumps(list(PREDICTION_RISK_TYPES))
+    })
     
-    return progression
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def _validate_horizon(years: int):
+    if not 1 <= years <= MAX_PREDICTION_YEARS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"years must be between 1 and {MAX_PREDICTION_YEARS}"
+        )
+
+def _validate_ensemble(simulations: int, location_count: int):
+    if not 1 <= simulations <= MAX_ENSEMBLE_SIMULATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"simulations must be between 1 and {MAX_ENSEMBLE_SIMULATIONS}"
+        )
+    if not 1 <= location_count <= MAX_ENSEMBLE_LOCATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Between 1 and {MAX_ENSEMBLE_LOCATIONS} locations are allowed"
+        )
 
 @router.get("/scenarios/{latitude}/{longitude}")
 async def get_climate_scenarios(
@@ -149,90 +297,57 @@ async def get_climate_scenarios(
     
     - **latitude**: Latitude coordinate
     - **longitude**: Longitude coordinate
-    - **scenario**: Scenario type (optimistic, moderate, pessimistic)
+    - **scenario**: Scenario type (optimistic, moderate, pessimistic), `all` for every
+      scenario, or `compare` for a scenario x metric comparison matrix
     """
     try:
-        scenarios_data = {
-            "optimistic": {
-                "description": "Strong climate action, rapid transition to renewables",
-                "temperature_increase_2050": 1.5,
-                "sea_level_rise_2050_cm": 30,
-                "extreme_events_increase": "20%"
-            },
-            "moderate": {
-                "description": "Current policies continue, moderate climate action",
-                "temperature_increase_2050": 2.5,
-                "sea_level_rise_2050_cm": 50,
-                "extreme_events_increase": "40%"
-            },
-            "pessimistic": {
-                "description": "Limited climate action, high emissions continue",
-                "temperature_increase_2050": 4.0,
-                "sea_level_rise_2050_cm": 80,
-                "extreme_events_increase": "70%"
-            }
-        }
-        
-        if scenario not in scenarios_data:
+        fragment = SCENARIO_PAYLOADS.get(scenario)
+        if fragment is None:
             raise HTTPException(status_code=400, detail="Invalid scenario")
         
-        return {
-            "location": f"{latitude},{longitude}",
-            "scenario": scenario,
-            "data": scenarios_data[scenario],
-            "impacts": _get_scenario_impacts(scenario),
-            "recommendations": _get_scenario_recommendations(scenario)
-        }
+        # Only the location differs between requests; the rest is pre-serialized
+        location = json.dumps(f"{latitude},{longitude}").encode()
+        return Response(
+            content=b'{"location":' + location + b"," + fragment + b"}",
+            media_type="application/json"
+        )
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating scenarios: {str(e)}")
 
-def _get_scenario_impacts(scenario: str) -> List[str]:
-    """Get expected impacts for scenario"""
-    impacts = {
-        "optimistic": [
-            "Manageable sea level rise",
-            "Reduced frequency of extreme weather",
-            "Stable agricultural productivity",
-            "Lower economic costs"
-        ],
-        "moderate": [
-            "Significant coastal flooding",
-            "Increased droughts and heatwaves",
-            "Agricultural challenges",
-            "Moderate economic disruption"
-        ],
-        "pessimistic": [
-            "Major coastal city flooding",
-            "Severe water scarcity",
-            "Widespread crop failures",
-            "Significant economic losses",
-            "Mass displacement of populations"
-        ]
+def _scenario_content(scenario: str) -> Dict[str, Any]:
+    return {
+        "scenario": scenario,
+        "data": SCENARIOS[scenario],
+        "impacts": SCENARIO_IMPACTS[scenario],
+        "recommendations": SCENARIO_RECOMMENDATIONS[scenario]
     }
-    return impacts.get(scenario, [])
-
-def _get_scenario_recommendations(scenario: str) -> List[str]:
-    """Get recommendations based on scenario"""
-    recommendations = {
-        "optimistic": [
-            "Continue supporting renewable energy",
-            "Implement moderate adaptation measures",
-            "Monitor climate trends closely"
-        ],
-        "moderate": [
-            "Accelerate transition to renewables",
-            "Invest in resilient infrastructure",
-            "Develop comprehensive adaptation plans",
-            "Reduce personal carbon footprint"
-        ],
-        "pessimistic": [
-            "Urgent action on emissions reduction",
-            "Major infrastructure upgrades needed",
-            "Consider relocation from high-risk areas",
-            "Develop emergency response capabilities"
-        ]
+
+def _json_fragment(content: Dict[str, Any]) -> bytes:
+    """Object members without the enclosing braces, for splicing into a response"""
+    return json.dumps(content, separators=(",", ":")).encode()[1:-1]
+
+def _build_scenario_payloads() -> Mapping[str, bytes]:
+    payloads = {
+        scenario: _json_fragment(_scenario_content(scenario))
+        for scenario in SCENARIO_NAMES
     }
-    return recommendations.get(scenario, [])
+    payloads["all"] = _json_fragment({
+        "scenario": "all",
+        "scenarios": {scenario: _scenario_content(scenario) for scenario in SCENARIO_NAMES}
+    })
+    payloads["compare"] = _json_fragment({
+        "scenario": "compare",
+        "scenarios": list(SCENARIO_NAMES),
+        "metrics": list(COMPARISON_METRICS),
+        "matrix": [
+            [SCENARIOS[scenario][metric] for metric in COMPARISON_METRICS]
+            for scenario in SCENARIO_NAMES
+        ]
+    })
+    return MappingProxyType(payloads)
+
+# Built once at import; scenario data is static
+SCENARIO_PAYLOADS = _build_scenario_payloads()
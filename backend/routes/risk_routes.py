@@ -1,19 +1,52 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Optional, Dict, Any, List, Iterator, Tuple, AsyncIterator
+from sqlalchemy import select, or_, case, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from geopy.geocoders import Nominatim
+from datetime import datetime, timedelta
+import asyncio
+import codecs
+import csv
+import json
+import math
+import os
+import tempfile
 
-from services.database import get_session, RiskAssessment
+from services.database import get_session, async_session_maker, save, RiskAssessment, IS_SQLITE
 from services.climate_service import climate_service
+from services.geocoding_service import geocoding_service
+from services.pagination import InvalidCursor, clamp_page_size, encode_cursor, keyset_before
+from services.risk_tiles import risk_tile_store, TILE_SIZE
+from services import geohash
 from models.risk_model import risk_assessment_ai
 
 router = APIRouter()
 
+# Upper bound on concurrent climate fetches for a single bulk request
+BULK_MAX_CONCURRENCY = int(os.getenv("RISK_BULK_MAX_CONCURRENCY", 32))
+BULK_DEFAULT_CONCURRENCY = int(os.getenv("RISK_BULK_DEFAULT_CONCURRENCY", 8))
+# Completed fetches are scored and saved together once this many are ready,
+# or once the oldest has waited BULK_FLUSH_MS
+BULK_BATCH_SIZE = int(os.getenv("RISK_BULK_BATCH_SIZE", 256))
+BULK_FLUSH_MS = float(os.getenv("RISK_BULK_FLUSH_MS", 250))
+
+# Stored assessments younger than this are returned instead of recomputed (0 disables)
+# Stored rows are matched to nearby coordinates on the climate cache grid
+# (CLIMATE_CACHE_GRID_DEGREES), the same cells the weather they used was cached for
+FRESHNESS_SECONDS = float(os.getenv("RISK_FRESHNESS_SECONDS", 900))
+
+# Nearest-neighbour search starts small and widens up to the maximum
+NEARBY_INITIAL_RADIUS_KM = float(os.getenv("NEARBY_INITIAL_RADIUS_KM", 5))
+NEARBY_MAX_RADIUS_KM = float(os.getenv("NEARBY_MAX_RADIUS_KM", 500))
+# Closest rows read per radius search before exact distances are checked
+NEARBY_MAX_CANDIDATES = int(os.getenv("NEARBY_MAX_CANDIDATES", 5000))
+
 class RiskAssessmentRequest(BaseModel):
     location: str
     latitude: Optional[float] = None
     longitude: Optional[float] = None
+    force_refresh: bool = False
 
 class RiskAssessmentResponse(BaseModel):
     location: str
@@ -26,6 +59,11 @@ class RiskAssessmentResponse(BaseModel):
     assessment_date: str
     confidence: float
 
+class BulkRiskAssessmentRequest(BaseModel):
+    locations: List[RiskAssessmentRequest]
+    concurrency: Optional[int] = None
+    persist: bool = True
+
 @router.post("/assess", response_model=RiskAssessmentResponse)
 async def assess_risk(
     request: RiskAssessmentRequest,
@@ -37,20 +75,26 @@ async def assess_risk(
     - **location**: Address or place name
     - **latitude**: Optional latitude coordinate
     - **longitude**: Optional longitude coordinate
+    - **force_refresh**: Recompute even if a recent assessment is stored
     """
     try:
         # Geocode location if coordinates not provided
         if request.latitude is None or request.longitude is None:
-            geolocator = Nominatim(user_agent="climate_planner")
-            location = geolocator.geocode(request.location)
+            coordinates = await geocoding_service.geocode(request.location)
             
-            if location is None:
+            if coordinates is None:
                 raise HTTPException(status_code=404, detail="Location not found")
             
-            lat, lon = location.latitude, location.longitude
+            lat, lon = coordinates
         else:
             lat, lon = request.latitude, request.longitude
         
+        # Reuse a recent assessment of the same location and grid cell
+        if not request.force_refresh:
+            recent = await _find_fresh_assessment(session, request.location, lat, lon)
+            if recent is not None:
+                return recent
+        
         # Fetch climate data
         current_weather = await climate_service.get_current_weather(lat, lon)
         historical_data = await climate_service.get_historical_data(lat, lon)
@@ -65,17 +109,7 @@ async def assess_risk(
         )
         
         # Save to database
-        db_assessment = RiskAssessment(
-            location=request.location,
-            latitude=lat,
-            longitude=lon,
-            risk_score=assessment["overall_risk_score"],
-            risk_level=assessment["risk_level"],
-            risk_types=assessment["risk_breakdown"],
-            assessment_data=assessment
-        )
-        session.add(db_assessment)
-        await session.commit()
+        await save(session, _assessment_row(assessment))
         
         return assessment
         
@@ -88,18 +122,33 @@ async def assess_risk(
 async def get_risk_history(
     location: str,
     limit: int = 10,
+    cursor: Optional[str] = None,
     session: AsyncSession = Depends(get_session)
 ):
-    """Get historical risk assessments for a location"""
+    """
+    Get historical risk assessments for a location, newest first
+    
+    - **limit**: Page size (max 100)
+    - **cursor**: `next_cursor` from the previous page
+    """
     try:
-        from sqlalchemy import select
-        
-        query = select(RiskAssessment).where(
-            RiskAssessment.location == location
-        ).order_by(RiskAssessment.created_at.desc()).limit(limit)
+        limit = clamp_page_size(limit)
+        query = select(
+            RiskAssessment.id,
+            RiskAssessment.risk_score,
+            RiskAssessment.risk_level,
+            RiskAssessment.created_at
+        ).where(RiskAssessment.location == location)
+        if cursor:
+            query = query.where(keyset_before(RiskAssessment.created_at, RiskAssessment.id, cursor))
+        query = query.order_by(RiskAssessment.created_at.desc(), RiskAssessment.id.desc()).limit(limit + 1)
         
         result = await session.execute(query)
-        assessments = result.scalars().all()
+        assessments = result.all()
+        next_cursor = None
+        if len(assessments) > limit:
+            assessments = assessments[:limit]
+            next_cursor = encode_cursor(assessments[-1].created_at, assessments[-1].id)
         
         return {
             "location": location,
@@ -112,8 +161,423 @@ async def get_risk_history(
                     "date": a.created_at.isoformat()
                 }
                 for a in assessments
-            ]
+            ],
+            "next_cursor": next_cursor
         }
         
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching history: {str(e)}")
+
+@router.get("/nearby")
+async def get_nearby_assessments(
+    latitude: float,
+    longitude: float,
+    radius_km: Optional[float] = None,
+    limit: int = 10,
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Find stored risk assessments near a point, closest first
+    
+    - **radius_km**: Search radius; if omitted, the nearest assessments within
+      NEARBY_MAX_RADIUS_KM are returned
+    - **limit**: Maximum results (max 100)
+    """
+    try:
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise HTTPException(status_code=400, detail="Invalid coordinates")
+        if radius_km is not None and radius_km <= 0:
+            raise HTTPException(status_code=400, detail="radius_km must be positive")
+        limit = clamp_page_size(limit)
+        
+        if radius_km is not None:
+            matches, truncated = await _assessments_within(session, latitude, longitude, radius_km)
+        else:
+            # Nearest neighbours: widen the search until enough rows are found
+            radius = NEARBY_INITIAL_RADIUS_KM
+            while True:
+                matches, truncated = await _assessments_within(session, latitude, longitude, radius)
+                if len(matches) >= limit or radius >= NEARBY_MAX_RADIUS_KM:
+                    break
+                radius = min(radius * 4, NEARBY_MAX_RADIUS_KM)
+        
+        return {
+            "latitude": latitude,
+            "longitude": longitude,
+            "radius_km": radius_km,
+            "total_results": min(len(matches), limit),
+            # More rows lay inside the radius than NEARBY_MAX_CANDIDATES; the
+            # farthest of them were not considered
+            "truncated": truncated,
+            "assessments": matches[:limit]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching nearby assessments: {str(e)}")
+
+@router.get("/tiles/metadata")
+async def get_tile_metadata():
+    """Get the hazards, zoom levels and conditions the risk tiles were built with"""
+    metadata = risk_tile_store.metadata()
+    if metadata is None:
+        raise HTTPException(status_code=404, detail="Risk tiles have not been built")
+    return metadata
+
+@router.get("/tiles/{hazard}/{z}/{x}/{y}")
+async def get_risk_tile(hazard: str, z: int, x: int, y: int):
+    """
+    Get a precomputed risk tile (slippy-map z/x/y)
+    
+    Returns 256x256 raw uint8 hazard scores (0-100), row-major from the
+    north-west corner. Build tiles with `python -m services.risk_tiles`.
+    """
+    tile = risk_tile_store.tile(hazard, z, x, y)
+    if tile is None:
+        raise HTTPException(status_code=404, detail="Tile not found")
+    return Response(
+        content=bytes(tile),
+        media_type="application/octet-stream",
+        headers={
+            "Cache-Control": "public, max-age=86400",
+            "X-Tile-Size": str(TILE_SIZE)
+        }
+    )
+
+@router.post("/assess/bulk")
+async def assess_risk_bulk(request: BulkRiskAssessmentRequest):
+    """
+    Assess climate risks for many locations, streaming NDJSON results
+
+    - **locations**: List of locations (same fields as /assess)
+    - **concurrency**: Optional number of concurrent climate fetches
+    - **persist**: Whether to store the assessments (default: true)
+
+    Each output line carries the input `index`; lines arrive in completion
+    order, not input order.
+    """
+    rows = (r.model_dump() for r in request.locations)
+    return StreamingResponse(
+        _stream_bulk_assessments(rows, _bulk_concurrency(request.concurrency), request.persist),
+        media_type="application/x-ndjson"
+    )
+
+@router.post("/assess/bulk/upload")
+async def assess_risk_bulk_upload(
+    file: UploadFile = File(...),
+    concurrency: Optional[int] = None,
+    persist: bool = True
+):
+    """
+    Assess climate risks for an uploaded CSV or NDJSON file of locations
+
+    - **file**: CSV with a `location,latitude,longitude` header, or NDJSON
+      with one location object per line (`.ndjson`/`.jsonl`)
+    - **concurrency**: Optional number of concurrent climate fetches
+    - **persist**: Whether to store the assessments (default: true)
+
+    The upload is read row by row while results stream back, so memory use
+    does not grow with the file size.
+    """
+    # The upload is closed once this handler returns, so spool it to a file
+    # owned by the streaming generator.
+    spool = tempfile.TemporaryFile()
+    while chunk := await file.read(1024 * 1024):
+        spool.write(chunk)
+    spool.seek(0)
+
+    filename = (file.filename or "").lower()
+    is_ndjson = filename.endswith((".ndjson", ".jsonl")) or file.content_type in (
+        "application/x-ndjson", "application/jsonl"
+    )
+
+    async def stream() -> AsyncIterator[str]:
+        try:
+            rows = _iter_ndjson_rows(spool) if is_ndjson else _iter_csv_rows(spool)
+            async for line in _stream_bulk_assessments(rows, _bulk_concurrency(concurrency), persist):
+                yield line
+        finally:
+            spool.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+def _assessment_row(assessment: Dict[str, Any]) -> RiskAssessment:
+    """Build the ORM row for a computed assessment"""
+    grid_lat, grid_lon = climate_service.snap_coordinates(assessment["latitude"], assessment["longitude"])
+    return RiskAssessment(
+        location=assessment["location"],
+        latitude=assessment["latitude"],
+        longitude=assessment["longitude"],
+        grid_lat=grid_lat,
+        grid_lon=grid_lon,
+        geohash=geohash.encode(assessment["latitude"], assessment["longitude"]),
+        risk_score=assessment["overall_risk_score"],
+        risk_level=assessment["risk_level"],
+        risk_types=assessment["risk_breakdown"],
+        assessment_data=assessment
+    )
+
+def _geohash_prefix_match(prefix: str):
+    """Condition matching geohashes that start with prefix, in a form the index can serve"""
+    if IS_SQLITE:
+        # SQLite only turns case-sensitive GLOB (not LIKE) into an index range
+        return RiskAssessment.geohash.op("GLOB")(prefix + "*")
+    # LIKE 'prefix%'; served by the text_pattern_ops index whatever the collation
+    return RiskAssessment.geohash.like(prefix + "%")
+
+def _approximate_distance(lat: float, lon: float):
+    """Squared equirectangular distance in degrees from a point, for ranking rows in SQL"""
+    dlat = RiskAssessment.latitude - lat
+    dlon = func.abs(RiskAssessment.longitude - lon)
+    # Across the antimeridian the short way round is 360 - dlon
+    dlon = case((dlon > 180, 360 - dlon), else_=dlon) * math.cos(math.radians(lat))
+    return dlat * dlat + dlon * dlon
+
+async def _assessments_within(
+    session: AsyncSession,
+    lat: float,
+    lon: float,
+    radius_km: float
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """Assessments within radius_km sorted by distance then recency, and
+    whether the candidate cap cut the search short
+
+    Candidates come from index range scans over the geohash cells covering
+    the circle. The database ranks them by approximate distance and returns
+    the NEARBY_MAX_CANDIDATES closest; exact distances are then checked on
+    that small set.
+    """
+    prefixes = geohash.covering_prefixes(lat, lon, radius_km)
+    radius_deg = radius_km / geohash.KM_PER_DEGREE
+    query = select(
+        RiskAssessment.id,
+        RiskAssessment.location,
+        RiskAssessment.latitude,
+        RiskAssessment.longitude,
+        RiskAssessment.risk_score,
+        RiskAssessment.risk_level,
+        RiskAssessment.created_at
+    )
+    if prefixes != [""]:
+        query = query.where(or_(*[_geohash_prefix_match(prefix) for prefix in prefixes]))
+    query = query.where(RiskAssessment.latitude.between(lat - radius_deg, lat + radius_deg))
+    query = query.order_by(
+        _approximate_distance(lat, lon),
+        RiskAssessment.created_at.desc()
+    ).limit(NEARBY_MAX_CANDIDATES + 1)
+    result = await session.execute(query)
+    rows = result.all()
+    truncated = len(rows) > NEARBY_MAX_CANDIDATES
+    
+    candidates = []
+    for row in rows[:NEARBY_MAX_CANDIDATES]:
+        distance = geohash.haversine_km(lat, lon, row.latitude, row.longitude)
+        if distance <= radius_km:
+            candidates.append((distance, row))
+    candidates.sort(key=lambda c: c[1].created_at, reverse=True)
+    candidates.sort(key=lambda c: c[0])
+    
+    return [
+        {
+            "id": row.id,
+            "location": row.location,
+            "latitude": row.latitude,
+            "longitude": row.longitude,
+            "distance_km": round(distance, 3),
+            "risk_score": row.risk_score,
+            "risk_level": row.risk_level,
+            "date": row.created_at.isoformat()
+        }
+        for distance, row in candidates
+    ], truncated
+
+async def _find_fresh_assessment(
+    session: AsyncSession,
+    location: str,
+    lat: float,
+    lon: float
+) -> Optional[Dict[str, Any]]:
+    """Return the newest stored assessment inside the freshness window, if any"""
+    if FRESHNESS_SECONDS <= 0:
+        return None
+    
+    grid_lat, grid_lon = climate_service.snap_coordinates(lat, lon)
+    cutoff = datetime.utcnow() - timedelta(seconds=FRESHNESS_SECONDS)
+    query = select(RiskAssessment.assessment_data).where(
+        RiskAssessment.location == location,
+        RiskAssessment.grid_lat == grid_lat,
+        RiskAssessment.grid_lon == grid_lon,
+        RiskAssessment.created_at >= cutoff
+    ).order_by(RiskAssessment.created_at.desc()).limit(1)
+    
+    result = await session.execute(query)
+    return result.scalar_one_or_none()
+
+def _bulk_concurrency(requested: Optional[int]) -> int:
+    """Clamp a requested concurrency to the configured bounds"""
+    if requested is None:
+        requested = BULK_DEFAULT_CONCURRENCY
+    return max(1, min(requested, BULK_MAX_CONCURRENCY))
+
+def _iter_csv_rows(spool) -> Iterator[Dict[str, Any]]:
+    """Yield location rows from a CSV file, treating blank coordinates as missing"""
+    reader = csv.DictReader(codecs.getreader("utf-8-sig")(spool))
+    for row in reader:
+        yield {key: (value if value != "" else None) for key, value in row.items()}
+
+def _iter_ndjson_rows(spool) -> Iterator[Any]:
+    """Yield location rows from an NDJSON file, skipping blank lines"""
+    for line in codecs.getreader("utf-8-sig")(spool):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield e
+
+async def _fetch_assessment_inputs(index: int, row: Any) -> Dict[str, Any]:
+    """Validate one bulk row and fetch the climate data needed to score it"""
+    try:
+        if isinstance(row, Exception):
+            raise row
+        request = RiskAssessmentRequest(**row)
+    except (ValidationError, TypeError, ValueError) as e:
+        return {"index": index, "error": f"Invalid location row: {str(e)}"}
+
+    try:
+        if request.latitude is None or request.longitude is None:
+            coordinates = await geocoding_service.geocode(request.location)
+            if coordinates is None:
+                return {"index": index, "location": request.location, "error": "Location not found"}
+            lat, lon = coordinates
+        else:
+            lat, lon = request.latitude, request.longitude
+
+        current_weather, historical_data = await asyncio.gather(
+            climate_service.get_current_weather(lat, lon),
+            climate_service.get_historical_data(lat, lon)
+        )
+    except Exception as e:
+        return {"index": index, "location": request.location, "error": f"Error assessing risk: {str(e)}"}
+
+    return {
+        "index": index,
+        "location": request.location,
+        "latitude": lat,
+        "longitude": lon,
+        "climate_data": current_weather,
+        "historical_data": historical_data
+    }
+
+def _score_bulk_inputs(inputs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Score a micro-batch of fetched inputs with the vectorized model"""
+    columns = risk_assessment_ai.to_batch_columns(
+        [i["climate_data"] for i in inputs],
+        [i["historical_data"] for i in inputs]
+    )
+    return risk_assessment_ai.assess_risk_batch(
+        locations=[i["location"] for i in inputs],
+        lat=[i["latitude"] for i in inputs],
+        lon=[i["longitude"] for i in inputs],
+        **columns
+    )
+
+async def _score_and_save(
+    session: AsyncSession,
+    batch: List[Dict[str, Any]],
+    persist: bool
+) -> List[str]:
+    """Score a batch of fetched inputs and persist it; returns the NDJSON lines to send"""
+    try:
+        assessments = _score_bulk_inputs(batch)
+    except Exception as e:
+        return [
+            json.dumps({
+                "index": item["index"],
+                "location": item["location"],
+                "error": f"Error assessing risk: {str(e)}"
+            }) + "\n"
+            for item in batch
+        ]
+
+    lines = [
+        json.dumps({"index": item["index"], **a}) + "\n"
+        for item, a in zip(batch, assessments)
+    ]
+    if persist:
+        try:
+            await save(session, *[_assessment_row(a) for a in assessments])
+        except Exception as e:
+            await session.rollback()
+            lines.append(json.dumps({
+                "indices": [item["index"] for item in batch],
+                "error": f"Error saving assessments: {str(e)}"
+            }) + "\n")
+    return lines
+
+async def _stream_bulk_assessments(
+    rows: Iterator[Any],
+    concurrency: int,
+    persist: bool
+) -> AsyncIterator[str]:
+    """
+    Fan out climate fetches with at most `concurrency` in flight and yield
+    NDJSON lines as results become available. Completed fetches are
+    collected until BULK_BATCH_SIZE are ready or the oldest has waited
+    BULK_FLUSH_MS, then scored as one batch and persisted with a single
+    commit. Invalid rows and failed fetches are reported immediately.
+    """
+    loop = asyncio.get_running_loop()
+    flush_interval = BULK_FLUSH_MS / 1000
+    rows = enumerate(rows)
+    pending = set()
+    exhausted = False
+    ready: List[Dict[str, Any]] = []
+    deadline = None
+
+    async with async_session_maker() as session:
+        try:
+            while True:
+                while not exhausted and len(pending) < concurrency:
+                    try:
+                        index, row = next(rows)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.ensure_future(_fetch_assessment_inputs(index, row)))
+
+                lines = []
+                if pending:
+                    timeout = None if deadline is None else max(0.0, deadline - loop.time())
+                    done, pending = await asyncio.wait(
+                        pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        completed = task.result()
+                        if "error" in completed:
+                            lines.append(json.dumps(completed) + "\n")
+                        else:
+                            ready.append(completed)
+                    if ready and deadline is None:
+                        deadline = loop.time() + flush_interval
+
+                if ready and (
+                    len(ready) >= BULK_BATCH_SIZE
+                    or not pending
+                    or loop.time() >= deadline
+                ):
+                    batch, ready = ready[:BULK_BATCH_SIZE], ready[BULK_BATCH_SIZE:]
+                    deadline = loop.time() + flush_interval if ready else None
+                    lines.extend(await _score_and_save(session, batch, persist))
+
+                if lines:
+                    yield "".join(lines)
+                if not pending and not ready:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
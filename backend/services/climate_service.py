@@ -1,79 +1,182 @@
 import os
 import httpx
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import json
 
+from services.cache import TTLCache, SingleFlight
+
 class ClimateDataService:
     def __init__(self):
         self.openweather_api_key = os.getenv("OPENWEATHER_API_KEY", "")
         self.nasa_api_key = os.getenv("NASA_API_KEY", "DEMO_KEY")
         self.base_url = "https://api.openweathermap.org/data/2.5"
         
+        # Shared HTTP client settings
+        self.http_max_connections = int(os.getenv("CLIMATE_HTTP_MAX_CONNECTIONS", 100))
+        self.http_max_keepalive = int(os.getenv("CLIMATE_HTTP_MAX_KEEPALIVE", 20))
+        self.http_keepalive_expiry = float(os.getenv("CLIMATE_HTTP_KEEPALIVE_EXPIRY", 30))
+        self.http_connect_timeout = float(os.getenv("CLIMATE_HTTP_CONNECT_TIMEOUT", 3))
+        self.http_request_timeout = float(os.getenv("CLIMATE_HTTP_TIMEOUT", 10))
+        self.http2 = os.getenv("CLIMATE_HTTP2", "False").lower() == "true"
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        # Current weather cache keyed by grid cell (0 disables snapping)
+        self.weather_cache_grid = float(os.getenv("CLIMATE_CACHE_GRID_DEGREES", 0.01))
+        self.weather_cache = TTLCache(
+            maxsize=int(os.getenv("CLIMATE_CACHE_MAX_ENTRIES", 10000)),
+            ttl=float(os.getenv("CLIMATE_CACHE_TTL_SECONDS", 60))
+        )
+        
+        # Identical concurrent calls await one shared in-flight request
+        self._flights = {
+            "current_weather": SingleFlight(),
+            "forecast": SingleFlight(),
+            "historical": SingleFlight()
+        }
+    
+    async def startup(self):
+        """Open the pooled HTTP client (called on application startup)"""
+        if self._client is None:
+            self._client = self._create_client()
+    
+    async def shutdown(self):
+        """Close the pooled HTTP client (called on application shutdown)"""
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the pooled client, creating it if startup() was not called"""
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        """Build a keep-alive client with bounded connection pool"""
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+                http2 = False
+        
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.http_max_connections,
+                max_keepalive_connections=self.http_max_keepalive,
+                keepalive_expiry=self.http_keepalive_expiry
+            ),
+            timeout=httpx.Timeout(self.http_request_timeout, connect=self.http_connect_timeout),
+            http2=http2
+        )
+        
+    def snap_coordinates(self, lat: float, lon: float) -> Tuple[float, float]:
+        """Snap coordinates to the centre of their weather cache grid cell"""
+        grid = self.weather_cache_grid
+        if grid <= 0:
+            return lat, lon
+        return round(round(lat / grid) * grid, 6), round(round(lon / grid) * grid, 6)
+    
     async def get_current_weather(self, lat: float, lon: float) -> Dict[str, Any]:
         """Get current weather data for location"""
+        cell = self.snap_coordinates(lat, lon)
+        cached = self.weather_cache.get(cell)
+        if cached is not None:
+            return dict(cached)
+        
         try:
-            async with httpx.AsyncClient() as client:
-                url = f"{self.base_url}/weather"
-                params = {
-                    "lat": lat,
-                    "lon": lon,
-                    "appid": self.openweather_api_key,
-                    "units": "metric"
-                }
-                response = await client.get(url, params=params)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return {
-                        "temperature": data["main"]["temp"],
-                        "feels_like": data["main"]["feels_like"],
-                        "humidity": data["main"]["humidity"],
-                        "pressure": data["main"]["pressure"],
-                        "wind_speed": data["wind"]["speed"],
-                        "weather": data["weather"][0]["description"],
-                        "clouds": data["clouds"]["all"]
-                    }
-                else:
-                    return self._get_mock_weather_data(lat, lon)
+            # Concurrent misses for the same cell share one upstream request
+            data = await self._flights["current_weather"].do(
+                cell, lambda: self._fetch_current_weather(*cell)
+            )
+            return dict(data)
         except Exception as e:
             print(f"Error fetching weather data: {e}")
             return self._get_mock_weather_data(lat, lon)
     
+    async def _fetch_current_weather(self, lat: float, lon: float) -> Dict[str, Any]:
+        """Fetch current weather from OpenWeatherMap and cache it for the cell"""
+        client = self._get_client()
+        url = f"{self.base_url}/weather"
+        params = {
+            "lat": lat,
+            "lon": lon,
+            "appid": self.openweather_api_key,
+            "units": "metric"
+        }
+        response = await client.get(url, params=params)
+        response.raise_for_status()
+        
+        data = response.json()
+        weather = {
+            "temperature": data["main"]["temp"],
+            "feels_like": data["main"]["feels_like"],
+            "humidity": data["main"]["humidity"],
+            "pressure": data["main"]["pressure"],
+            "wind_speed": data["wind"]["speed"],
+            "weather": data["weather"][0]["description"],
+            "clouds": data["clouds"]["all"]
+        }
+        # Mock fallbacks are never cached so upstream recovery is picked up immediately
+        self.weather_cache.set((lat, lon), weather)
+        return weather
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Report weather cache and request coalescing counters"""
+        return {
+            "current_weather": {
+                "grid_degrees": self.weather_cache_grid,
+                **self.weather_cache.stats()
+            },
+            "single_flight": {name: flight.stats() for name, flight in self._flights.items()}
+        }
+    
     async def get_forecast(self, lat: float, lon: float, days: int = 5) -> Dict[str, Any]:
         """Get weather forecast for location"""
         try:
-            async with httpx.AsyncClient() as client:
-                url = f"{self.base_url}/forecast"
-                params = {
-                    "lat": lat,
-                    "lon": lon,
-                    "appid": self.openweather_api_key,
-                    "units": "metric",
-                    "cnt": days * 8  # 8 forecasts per day (3-hour intervals)
-                }
-                response = await client.get(url, params=params)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    forecasts = []
-                    for item in data["list"]:
-                        forecasts.append({
-                            "datetime": item["dt_txt"],
-                            "temperature": item["main"]["temp"],
-                            "humidity": item["main"]["humidity"],
-                            "weather": item["weather"][0]["description"],
-                            "precipitation_prob": item.get("pop", 0) * 100
-                        })
-                    return {"forecasts": forecasts}
-                else:
-                    return self._get_mock_forecast(days)
+            return await self._flights["forecast"].do(
+                (lat, lon, days), lambda: self._fetch_forecast(lat, lon, days)
+            )
         except Exception as e:
             print(f"Error fetching forecast: {e}")
             return self._get_mock_forecast(days)
     
+    async def _fetch_forecast(self, lat: float, lon: float, days: int) -> Dict[str, Any]:
+        """Fetch the 3-hourly forecast from OpenWeatherMap"""
+        client = self._get_client()
+        url = f"{self.base_url}/forecast"
+        params = {
+            "lat": lat,
+            "lon": lon,
+            "appid": self.openweather_api_key,
+            "units": "metric",
+            "cnt": days * 8  # 8 forecasts per day (3-hour intervals)
+        }
+        response = await client.get(url, params=params)
+        response.raise_for_status()
+        
+        data = response.json()
+        forecasts = []
+        for item in data["list"]:
+            forecasts.append({
+                "datetime": item["dt_txt"],
+                "temperature": item["main"]["temp"],
+                "humidity": item["main"]["humidity"],
+                "weather": item["weather"][0]["description"],
+                "precipitation_prob": item.get("pop", 0) * 100
+            })
+        return {"forecasts": forecasts}
+    
     async def get_historical_data(self, lat: float, lon: float, months: int = 12) -> Dict[str, Any]:
         """Get historical climate data"""
+        return await self._flights["historical"].do(
+            (lat, lon, months), lambda: self._fetch_historical_data(lat, lon, months)
+        )
+    
+    async def _fetch_historical_data(self, lat: float, lon: float, months: int) -> Dict[str, Any]:
+        """Load historical climate data"""
         # Mock historical data for demonstration
         return self._get_mock_historical_data(lat, lon, months)
     
@@ -1,13 +1,93 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON, Index, insert, inspect, event, text
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
+import asyncio
+import json
 import os
+import time
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./climate_planner.db")
+def _async_database_url(url: str) -> str:
+    """Add the async driver to plain sqlite:// and postgresql:// URLs"""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgresql:") or url.startswith("postgres:"):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+DATABASE_URL = _async_database_url(os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./climate_planner.db"))
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# Engine settings
+DB_ECHO = os.getenv("DB_ECHO", "False").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 1800))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", 30))
+
+# SQLite pragmas applied to every new connection
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", -64000)),  # negative = KiB
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "temp_store": "MEMORY"
+}
+
+# Statement timing
+DB_STATEMENT_TIMING = os.getenv("DB_STATEMENT_TIMING", "False").lower() == "true"
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", 100))
+
+def _engine_options() -> Dict[str, Any]:
+    """Keyword arguments for create_async_engine based on the database backend"""
+    options: Dict[str, Any] = {"echo": DB_ECHO}
+    if not IS_SQLITE:
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_recycle=DB_POOL_RECYCLE_SECONDS,
+            pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+            pool_pre_ping=True
+        )
+    return options
+
+engine = create_async_engine(DATABASE_URL, **_engine_options())
+
+if IS_SQLITE:
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
+statement_stats = {"statements": 0, "total_ms": 0.0, "slow_statements": 0, "max_ms": 0.0}
+
+if DB_STATEMENT_TIMING:
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("statement_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _record_statement_time(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["statement_start"].pop()) * 1000
+        statement_stats["statements"] += 1
+        statement_stats["total_ms"] += elapsed_ms
+        statement_stats["max_ms"] = max(statement_stats["max_ms"], elapsed_ms)
+        if elapsed_ms >= DB_SLOW_QUERY_MS:
+            statement_stats["slow_statements"] += 1
+            print(f"Slow SQL ({elapsed_ms:.1f} ms): {statement[:200]}")
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _discard_statement_timer(context):
+        # A failed statement never reaches after_cursor_execute; drop its start time
+        conn = context.connection
+        if conn is not None and conn.info.get("statement_start"):
+            conn.info["statement_start"].pop()
 
-engine = create_async_engine(DATABASE_URL, echo=True)
 async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
@@ -22,7 +102,27 @@ class RiskAssessment(Base):
     risk_level = Column(String)
     risk_types = Column(JSON)
     assessment_data = Column(JSON)
+    # Coordinates snapped to the reuse grid, for freshness lookups
+    grid_lat = Column(Float)
+    grid_lon = Column(Float)
+    # Full-precision geohash; B-tree prefix scans on it find nearby rows
+    # (backfill older rows with python -m services.geohash_backfill)
+    geohash = Column(String(12))
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_risk_assessments_location_grid_created", "location", "grid_lat", "grid_lon", "created_at"),
+        # Covers the paginated history query without touching the JSON columns
+        Index(
+            "ix_risk_assessments_location_created_id",
+            "location", "created_at", "id", "risk_score", "risk_level"
+        ),
+        # text_pattern_ops lets Postgres use the index for LIKE 'prefix%' under any collation
+        Index(
+            "ix_risk_assessments_geohash", "geohash",
+            postgresql_ops={"geohash": "text_pattern_ops"}
+        ),
+    )
 
 class ActionPlan(Base):
     __tablename__ = "action_plans"
@@ -37,6 +137,10 @@ class ActionPlan(Base):
     estimated_impact = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_action_plans_user_created_id", "user_id", "created_at", "id"),
+    )
 
 class ClimateData(Base):
     __tablename__ = "climate_data"
@@ -64,13 +168,345 @@ class CarbonFootprint(Base):
     emissions_kg = Column(Float)
     calculation_data = Column(JSON)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_carbon_footprints_user_category", "user_id", "category"),
+    )
+
+class FootprintRollup(Base):
+    __tablename__ = "footprint_rollups"
+    
+    # Running totals per user, category and calendar month (YYYY-MM)
+    user_id = Column(String, primary_key=True)
+    category = Column(String, primary_key=True)
+    month = Column(String, primary_key=True)
+    emissions_kg = Column(Float, default=0)
+    entries = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class GeocodeCache(Base):
+    __tablename__ = "geocode_cache"
+    
+    query = Column(String, primary_key=True)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    display_name = Column(String)
+    source = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+def _upgrade_schema(connection):
+    """Add columns and indexes introduced since a table was created
+
+    create_all only creates missing tables, so databases from earlier
+    releases would lack them. Only additive changes are made: nullable
+    columns (existing rows get NULL) and indexes.
+    """
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or column.primary_key:
+                continue
+            connection.execute(text(
+                f"ALTER TABLE {preparer.format_table(table)} "
+                f"ADD COLUMN {preparer.format_column(column)} {column.type.compile(connection.dialect)}"
+            ))
+            print(f"Added column {table.name}.{column.name}")
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
 
 async def init_db():
-    """Initialize database tables"""
+    """Initialize database tables, upgrading existing ones in place"""
     async with engine.begin() as conn:
+        had_rollups = await conn.run_sync(
+            lambda sync_conn: inspect(sync_conn).has_table(FootprintRollup.__tablename__)
+        )
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_upgrade_schema)
+    
+    if not had_rollups:
+        # A new rollup table must start from the footprints already stored
+        from services.footprint_rollup import rebuild_footprint_rollups
+        try:
+            async with async_session_maker() as session:
+                count = await rebuild_footprint_rollups(session)
+            if count:
+                print(f"Seeded {count} footprint rollup rows")
+        except Exception as e:
+            print(f"Seeding footprint rollups failed, run python -m services.footprint_rollup: {e}")
+
+# Callbacks run inside the inserting transaction: hook(session, rows)
+InsertHook = Callable[[AsyncSession, List[Dict[str, Any]]], Awaitable[None]]
+_insert_hooks: Dict[type, List[InsertHook]] = {}
+
+def register_insert_hook(model: type, hook: InsertHook):
+    """Run hook with the inserted column values whenever rows of model are saved"""
+    _insert_hooks.setdefault(model, []).append(hook)
+
+async def run_insert_hooks(session: AsyncSession, model: type, rows: List[Dict[str, Any]]):
+    """Apply registered insert hooks for rows of model within session's transaction"""
+    for hook in _insert_hooks.get(model, []):
+        await hook(session, rows)
+
+# Marks a wake-up with no new row (used to retry failed rows)
+_NO_ITEM = object()
+
+class WriteBehindQueue:
+    """Buffer ORM inserts and flush them in bulk from a background task
+
+    Rows are flushed once batch_size rows are buffered or flush_interval_ms
+    has passed since the first buffered row. enqueue() waits when max_pending
+    rows are already queued, which applies backpressure to request handlers.
+    
+    If a batch fails, its rows are inserted one at a time so a single bad row
+    cannot take the rest down with it. Rows that still fail are retried on
+    later flushes, up to max_retries attempts, and are then appended to the
+    dead-letter file (JSON lines) so they can be recovered by hand.
+    """
+    
+    def __init__(
+        self,
+        batch_size: int = 500,
+        flush_interval_ms: float = 200,
+        max_pending: int = 10000,
+        max_retries: int = 3,
+        dead_letter_path: str = "write_behind_failed.jsonl"
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.dead_letter_path = dead_letter_path
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # (model, values, failed attempts) awaiting another try
+        self._retry: List[Tuple[type, Dict[str, Any], int]] = []
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.retried_rows = 0
+        self.failed_rows = 0
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self):
+        """Start the background flusher (called on application startup)"""
+        if not self.running:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.ensure_future(self._run())
+    
+    async def stop(self):
+        """Flush everything still buffered and stop (called on application shutdown)"""
+        if self.running:
+            await self._queue.put(None)
+            await self._task
+        self._task = None
+    
+    async def enqueue(self, *objects: Base):
+        """Queue ORM objects for insertion, filling client-side defaults now"""
+        for obj in objects:
+            await self._queue.put((type(obj), _row_values(obj)))
+    
+    async def enqueue_rows(self, model: type, rows: List[Dict[str, Any]]):
+        """Queue column-value dicts (already passed through _complete_row) for model"""
+        for row in rows:
+            await self._queue.put((model, row))
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            if self._retry:
+                # Wake up to retry failed rows even if nothing new arrives
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    item = _NO_ITEM
+            else:
+                item = await self._queue.get()
+            if item is None:
+                break
+            batch = [] if item is _NO_ITEM else [item]
+            deadline = loop.time() + self.flush_interval
+            while batch and len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+        
+        # One last attempt on shutdown, then keep whatever still fails
+        if self._retry:
+            await self._flush([])
+        if self._retry:
+            self._dead_letter(self._retry, "unflushed at shutdown")
+            self._retry = []
+    
+    async def _flush(self, batch: List[Tuple[type, Dict[str, Any]]]):
+        """Insert retried rows plus a new batch with one executemany INSERT per table and a single commit"""
+        entries = self._retry + [(model, values, 0) for model, values in batch]
+        self._retry = []
+        if not entries:
+            return
+        
+        rows_by_model: Dict[type, List[Dict[str, Any]]] = {}
+        for model, values, _ in entries:
+            rows_by_model.setdefault(model, []).append(values)
+        
+        try:
+            async with async_session_maker() as session:
+                for model, rows in rows_by_model.items():
+                    await session.execute(insert(model), rows)
+                    await run_insert_hooks(session, model, rows)
+                await session.commit()
+            self.flushes += 1
+            self.flushed_rows += len(entries)
+        except Exception as e:
+            print(f"Error flushing {len(entries)} buffered rows, retrying one at a time: {e}")
+            await self._flush_rows(entries)
+    
+    async def _flush_rows(self, entries: List[Tuple[type, Dict[str, Any], int]]):
+        """Insert rows individually, keeping failures for a later retry or the dead-letter file"""
+        exhausted = []
+        for model, values, attempts in entries:
+            try:
+                async with async_session_maker() as session:
+                    await session.execute(insert(model), [values])
+                    await run_insert_hooks(session, model, [values])
+                    await session.commit()
+                self.flushed_rows += 1
+            except Exception as e:
+                attempts += 1
+                if attempts >= self.max_retries:
+                    exhausted.append((model, values, attempts, str(e)))
+                else:
+                    self.retried_rows += 1
+                    self._retry.append((model, values, attempts))
+        if exhausted:
+            self._dead_letter(exhausted)
+    
+    def _dead_letter(self, entries: List[tuple], error: Optional[str] = None):
+        """Append rows that could not be inserted to the dead-letter file"""
+        self.failed_rows += len(entries)
+        try:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps({
+                        "table": entry[0].__tablename__,
+                        "values": entry[1],
+                        "attempts": entry[2],
+                        "error": entry[3] if len(entry) > 3 else error,
+                        "failed_at": datetime.utcnow().isoformat()
+                    }, default=str) + "\n")
+            print(f"Wrote {len(entries)} uninsertable rows to {self.dead_letter_path}")
+        except OSError as e:
+            print(f"Could not write {len(entries)} failed rows to {self.dead_letter_path}: {e}")
+            for entry in entries:
+                print(f"Lost row for {entry[0].__tablename__}: {json.dumps(entry[1], default=str)}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and flush counters"""
+        return {
+            "enabled": self.running,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "retrying": len(self._retry),
+            "retried_rows": self.retried_rows,
+            "failed_rows": self.failed_rows
+        }
+
+def _complete_row(model: type, values: Dict[str, Any]) -> Dict[str, Any]:
+    """Full column values for an insert, applying Python-side column defaults
+
+    Every row of a model gets the same keys so batches can be executed as
+    one executemany INSERT.
+    """
+    row = {}
+    for column in inspect(model).columns:
+        value = values.get(column.key)
+        if value is None and column.default is not None:
+            default = column.default
+            value = default.arg(None) if default.is_callable else default.arg
+        if value is None and column.primary_key:
+            continue
+        row[column.key] = value
+    return row
+
+def _row_values(obj: Base) -> Dict[str, Any]:
+    """Column values for an ORM object, writing applied defaults back onto it"""
+    mapper = inspect(obj).mapper
+    row = _complete_row(type(obj), {attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+    for key, value in row.items():
+        if getattr(obj, key) is None:
+            setattr(obj, key, value)
+    return row
+
+WRITE_BEHIND_ENABLED = os.getenv("DB_WRITE_BEHIND", "False").lower() == "true"
+
+write_behind_queue = WriteBehindQueue(
+    batch_size=int(os.getenv("DB_WRITE_BEHIND_BATCH_SIZE", 500)),
+    flush_interval_ms=float(os.getenv("DB_WRITE_BEHIND_FLUSH_MS", 200)),
+    max_pending=int(os.getenv("DB_WRITE_BEHIND_MAX_PENDING", 10000)),
+    max_retries=int(os.getenv("DB_WRITE_BEHIND_MAX_RETRIES", 3)),
+    dead_letter_path=os.getenv("DB_WRITE_BEHIND_DEAD_LETTER_PATH", "write_behind_failed.jsonl")
+)
+
+async def save(session: AsyncSession, *objects: Base, sync: bool = False):
+    """Persist new ORM objects
+
+    With DB_WRITE_BEHIND enabled the rows are handed to the write-behind
+    queue and this returns without waiting for a commit. Pass sync=True
+    (or leave write-behind disabled) when the caller needs read-your-writes.
+    """
+    if sync or not write_behind_queue.running:
+        session.add_all(objects)
+        rows_by_model: Dict[type, List[Dict[str, Any]]] = {}
+        for obj in objects:
+            if type(obj) in _insert_hooks:
+                rows_by_model.setdefault(type(obj), []).append(_row_values(obj))
+        for model, rows in rows_by_model.items():
+            await run_insert_hooks(session, model, rows)
+        await session.commit()
+    else:
+        await write_behind_queue.enqueue(*objects)
+
+async def save_rows(
+    session: AsyncSession,
+    model: type,
+    rows: List[Dict[str, Any]],
+    sync: bool = False
+) -> List[Dict[str, Any]]:
+    """Bulk insert column-value dicts for model without building ORM objects
+
+    Missing columns are filled from their defaults; the completed rows are
+    returned. Uses the write-behind queue under the same rules as save().
+    """
+    rows = [_complete_row(model, values) for values in rows]
+    if not rows:
+        return rows
+    if sync or not write_behind_queue.running:
+        await session.execute(insert(model), rows)
+        await run_insert_hooks(session, model, rows)
+        await session.commit()
+    else:
+        await write_behind_queue.enqueue_rows(model, rows)
+    return rows
 
 async def get_session():
     """Get database session"""
     async with async_session_maker() as session:
         yield session
+
+# Registers the footprint rollup insert hook, so every entry point that saves
+# CarbonFootprint rows (API, write-behind queue, CLI importers) keeps rollups current
+import services.footprint_rollup  # noqa: E402,F401
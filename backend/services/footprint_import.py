@@ -0,0 +1,268 @@
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from models.footprint_model import EMISSION_FACTORS, get_equivalent
+from services.database import async_session_maker, init_db, save_rows, CarbonFootprint
+
+DEFAULT_CHUNK_SIZE = 50000
+# Largest chunk a request may ask for; memory use grows with the chunk size
+MAX_CHUNK_SIZE = int(os.getenv("FOOTPRINT_IMPORT_MAX_CHUNK_SIZE", 500000))
+
+# Target field -> source column; unmapped fields use the same name
+DEFAULT_COLUMNS = {
+    "user_id": "user_id",
+    "category": "category",
+    "activity_type": "activity_type",
+    "amount": "amount",
+    "unit": "unit",
+    "created_at": "created_at"
+}
+
+# "category\x1factivity_type" -> kg CO2 per unit, for vectorized lookups
+_FACTOR_LOOKUP = {
+    f"{category}\x1f{activity}": factor
+    for category, activities in EMISSION_FACTORS.items()
+    for activity, factor in activities.items()
+}
+
+def detect_format(path: str) -> str:
+    """Guess the file format from its extension"""
+    return "parquet" if path.lower().endswith((".parquet", ".pq")) else "csv"
+
+def iter_chunks(
+    source: Union[str, BinaryIO],
+    file_format: str,
+    chunk_size: int
+) -> Iterator[pd.DataFrame]:
+    """Read a CSV or Parquet file (path or binary file object) in chunks of rows"""
+    if file_format == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet import requires the 'pyarrow' package")
+        parquet_file = pq.ParquetFile(source)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False)
+
+def prepare_chunk(
+    chunk: pd.DataFrame,
+    columns: Dict[str, str],
+    user_id: Optional[str] = None,
+    category: Optional[str] = None,
+    default_unit: str = ""
+) -> Dict[str, Any]:
+    """Map columns, apply emission factors and build insert rows for one chunk
+
+    user_id/category, when given, apply to every row instead of a column.
+    Rows with an unknown category/activity pair or a non-numeric amount are
+    counted as rejected and skipped.
+    """
+    required = ["activity_type", "amount"]
+    required += [] if user_id is not None else ["user_id"]
+    required += [] if category is not None else ["category"]
+    missing = [columns[field] for field in required if columns[field] not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    
+    n = len(chunk)
+    activity = chunk[columns["activity_type"]].astype(str).str.strip().str.lower()
+    if category is not None:
+        category = pd.Series(category.strip().lower(), index=chunk.index)
+    else:
+        category = chunk[columns["category"]].astype(str).str.strip().str.lower()
+    amount = pd.to_numeric(chunk[columns["amount"]], errors="coerce").to_numpy(dtype=float)
+    factor = (category + "\x1f" + activity).map(_FACTOR_LOOKUP).to_numpy(dtype=float)
+
+    valid = ~(np.isnan(amount) | np.isnan(factor))
+    emissions = amount * factor
+
+    if user_id is not None:
+        users = np.full(n, user_id, dtype=object)
+    else:
+        users = chunk[columns["user_id"]].astype(str).to_numpy(dtype=object)
+
+    if columns["unit"] in chunk.columns:
+        units = chunk[columns["unit"]].astype(str).to_numpy(dtype=object)
+    else:
+        units = np.full(n, default_unit, dtype=object)
+
+    now = datetime.utcnow()
+    if columns["created_at"] in chunk.columns:
+        # Stored as naive UTC like datetime.utcnow(); unparseable values fall back to now
+        timestamps = pd.to_datetime(chunk[columns["created_at"]], errors="coerce", utc=True)
+        timestamps = timestamps.dt.tz_localize(None).fillna(pd.Timestamp(now))
+        created = np.array(timestamps.dt.to_pydatetime(), dtype=object)
+    else:
+        created = np.full(n, now, dtype=object)
+
+    idx = np.flatnonzero(valid)
+    category_values = category.to_numpy(dtype=object)[idx].tolist()
+    activity_values = activity.to_numpy(dtype=object)[idx].tolist()
+    amount_values = amount[idx].tolist()
+    emission_values = emissions[idx].tolist()
+    factor_values = factor[idx].tolist()
+
+    rows = [
+        {
+            "user_id": u,
+            "category": c,
+            "activity_type": a,
+            "amount": amt,
+            "emissions_kg": e,
+            "calculation_data": {
+                "emission_factor": f,
+                "unit": unit,
+                "equivalent": get_equivalent(e),
+                "source": "import"
+            },
+            "created_at": t
+        }
+        for u, c, a, amt, e, f, unit, t in zip(
+            users[idx].tolist(), category_values, activity_values, amount_values,
+            emission_values, factor_values, units[idx].tolist(), created[idx].tolist()
+        )
+    ]
+
+    return {
+        "rows": rows,
+        "rows_read": n,
+        "rejected": n - len(rows),
+        "emissions_kg": float(emissions[idx].sum())
+    }
+
+async def import_activity_file(
+    source: Union[str, BinaryIO],
+    file_format: Optional[str] = None,
+    column_map: Optional[Dict[str, str]] = None,
+    user_id: Optional[str] = None,
+    category: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[Callable[[Dict[str, Any]], Any]] = None
+) -> Dict[str, Any]:
+    """Stream an activity log into carbon_footprints chunk by chunk
+
+    Parsing and emission calculation run in a worker thread so the event
+    loop stays free; each chunk is written with one bulk insert and commit.
+    Memory use is bounded by chunk_size, not the file size.
+    """
+    columns = {**DEFAULT_COLUMNS, **(column_map or {})}
+    if file_format is None:
+        file_format = detect_format(source if isinstance(source, str) else getattr(source, "name", ""))
+    loop = asyncio.get_running_loop()
+    chunks = iter_chunks(source, file_format, chunk_size)
+    done = object()
+
+    def next_prepared():
+        chunk = next(chunks, done)
+        if chunk is done:
+            return None
+        return prepare_chunk(chunk, columns, user_id, category)
+
+    report = {
+        "file_format": file_format,
+        "rows_read": 0,
+        "rows_imported": 0,
+        "rows_rejected": 0,
+        "emissions_kg": 0.0,
+        "chunks": 0,
+        "elapsed_seconds": 0.0,
+        "rows_per_second": 0.0
+    }
+    total_emissions = 0.0
+    started = time.perf_counter()
+    reading = None
+
+    try:
+        async with async_session_maker() as session:
+            while True:
+                # Shielded so that, if the import is cancelled, the read in the
+                # worker thread is still tracked and can be waited for
+                reading = loop.run_in_executor(None, next_prepared)
+                prepared = await asyncio.shield(reading)
+                if prepared is None:
+                    break
+
+                await save_rows(session, CarbonFootprint, prepared["rows"], sync=True)
+
+                elapsed = time.perf_counter() - started
+                total_emissions += prepared["emissions_kg"]
+                report["chunks"] += 1
+                report["rows_read"] += prepared["rows_read"]
+                report["rows_imported"] += len(prepared["rows"])
+                report["rows_rejected"] += prepared["rejected"]
+                report["emissions_kg"] = round(total_emissions, 2)
+                report["elapsed_seconds"] = round(elapsed, 3)
+                report["rows_per_second"] = round(report["rows_read"] / elapsed, 1) if elapsed else 0.0
+                if progress is not None:
+                    result = progress(dict(report))
+                    if asyncio.iscoroutine(result):
+                        await result
+    finally:
+        if reading is not None and not reading.done():
+            # Cancelled mid-chunk: the worker thread is still reading the source
+            await asyncio.wait([reading])
+        chunks.close()
+
+    return report
+
+def parse_column_map(pairs: List[str]) -> Dict[str, str]:
+    """Parse "field=column" pairs into a column map"""
+    column_map = {}
+    for pair in pairs:
+        target, _, source = pair.partition("=")
+        target, source = target.strip(), source.strip()
+        if target not in DEFAULT_COLUMNS or not source:
+            raise ValueError(f"Invalid column mapping: {pair} (expected field=column)")
+        column_map[target] = source
+    return column_map
+
+async def _main(args: argparse.Namespace):
+    try:
+        column_map = parse_column_map(args.map)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    await init_db()
+
+    def print_progress(report: Dict[str, Any]):
+        print(
+            f"chunk {report['chunks']}: {report['rows_read']} rows read, "
+            f"{report['rows_imported']} imported, {report['rows_rejected']} rejected "
+            f"({report['rows_per_second']} rows/s)"
+        )
+
+    report = await import_activity_file(
+        args.path,
+        file_format=args.format,
+        column_map=column_map,
+        user_id=args.user_id,
+        category=args.category,
+        chunk_size=args.chunk_size,
+        progress=print_progress
+    )
+    print(
+        f"Imported {report['rows_imported']} of {report['rows_read']} rows "
+        f"({report['emissions_kg']} kg CO2) in {report['elapsed_seconds']}s"
+    )
+
+if __name__ == "__main__":
+    # python -m services.footprint_import fleet_log.csv --user-id acme --category transportation --map amount=km
+    parser = argparse.ArgumentParser(description="Import activity logs into carbon footprints")
+    parser.add_argument("path", help="CSV or Parquet file")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Override format detection")
+    parser.add_argument("--user-id", help="Assign every row to this user instead of a user_id column")
+    parser.add_argument("--category", help="Assign every row to this category instead of a category column")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument(
+        "--map", action="append", default=[], metavar="FIELD=COLUMN",
+        help="Map a footprint field (user_id, category, activity_type, amount, unit, created_at) to a file column"
+    )
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,109 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.database import (
+    async_session_maker, init_db, register_insert_hook,
+    CarbonFootprint, FootprintRollup, IS_SQLITE
+)
+
+if IS_SQLITE:
+    from sqlalchemy.dialects.sqlite import insert as upsert
+else:
+    from sqlalchemy.dialects.postgresql import insert as upsert
+
+def month_key(timestamp: datetime) -> str:
+    """Calendar month bucket used by the rollup table"""
+    return timestamp.strftime("%Y-%m")
+
+def month_expression(column):
+    """SQL expression formatting a timestamp column as YYYY-MM"""
+    if IS_SQLITE:
+        return func.strftime("%Y-%m", column)
+    return func.to_char(column, "YYYY-MM")
+
+async def apply_footprint_rollups(session: AsyncSession, rows: List[Dict[str, Any]]):
+    """Add newly inserted footprint rows to the running per-month totals
+
+    Runs in the same transaction as the CarbonFootprint insert, so the raw
+    rows and the rollups commit (or roll back) together.
+    """
+    totals: Dict[tuple, List[float]] = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        key = (row["user_id"], row["category"], month_key(row["created_at"]))
+        totals[key][0] += row["emissions_kg"] or 0
+        totals[key][1] += 1
+    
+    if not totals:
+        return
+    
+    now = datetime.utcnow()
+    statement = upsert(FootprintRollup)
+    statement = statement.on_conflict_do_update(
+        index_elements=[FootprintRollup.user_id, FootprintRollup.category, FootprintRollup.month],
+        set_={
+            "emissions_kg": FootprintRollup.emissions_kg + statement.excluded.emissions_kg,
+            "entries": FootprintRollup.entries + statement.excluded.entries,
+            "updated_at": statement.excluded.updated_at
+        }
+    )
+    await session.execute(statement, [
+        {
+            "user_id": user_id,
+            "category": category,
+            "month": month,
+            "emissions_kg": emissions,
+            "entries": entries,
+            "updated_at": now
+        }
+        for (user_id, category, month), (emissions, entries) in totals.items()
+    ])
+
+register_insert_hook(CarbonFootprint, apply_footprint_rollups)
+
+async def rebuild_footprint_rollups(session: AsyncSession, user_id: Optional[str] = None) -> int:
+    """Recompute rollups from the raw carbon_footprints rows; returns rollup rows written"""
+    clear = delete(FootprintRollup)
+    # One expression object, so SELECT and GROUP BY share a bound parameter
+    # (Postgres rejects to_char(..., $1) grouped by to_char(..., $2))
+    month = month_expression(CarbonFootprint.created_at)
+    source = select(
+        CarbonFootprint.user_id,
+        CarbonFootprint.category,
+        month,
+        func.sum(CarbonFootprint.emissions_kg),
+        func.count(),
+        func.max(CarbonFootprint.created_at)
+    ).group_by(
+        CarbonFootprint.user_id,
+        CarbonFootprint.category,
+        month
+    )
+    if user_id is not None:
+        clear = clear.where(FootprintRollup.user_id == user_id)
+        source = source.where(CarbonFootprint.user_id == user_id)
+    
+    await session.execute(clear)
+    result = await session.execute(
+        insert(FootprintRollup).from_select(
+            ["user_id", "category", "month", "emissions_kg", "entries", "updated_at"],
+            source
+        )
+    )
+    await session.commit()
+    return result.rowcount
+
+async def _main(user_id: Optional[str] = None):
+    await init_db()
+    async with async_session_maker() as session:
+        count = await rebuild_footprint_rollups(session, user_id)
+    print(f"Rebuilt {count} footprint rollup rows")
+
+if __name__ == "__main__":
+    # python -m services.footprint_rollup [user_id]
+    import sys
+    asyncio.run(_main(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,119 @@
+import asyncio
+import csv
+import os
+import unicodedata
+from typing import Dict, Optional, Tuple
+
+from geopy.geocoders import Nominatim
+
+from services.cache import TTLCache, SingleFlight
+from services.database import async_session_maker, GeocodeCache
+
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "gazetteer.csv")
+
+# Cached marker for places the upstream geocoder could not resolve
+_NOT_FOUND = ()
+
+class GeocodingService:
+    """Resolve place names to coordinates without blocking the event loop
+
+    Lookups go through the bundled offline gazetteer, an in-memory LRU, the
+    persistent geocode_cache table and finally Nominatim, which runs in a
+    worker thread. Upstream results are written back to both caches.
+    """
+    
+    def __init__(self):
+        self.user_agent = os.getenv("GEOCODER_USER_AGENT", "climate_planner")
+        self.timeout = float(os.getenv("GEOCODER_TIMEOUT_SECONDS", 5))
+        self.gazetteer_path = os.getenv("GAZETTEER_PATH", DEFAULT_GAZETTEER_PATH)
+        self.cache = TTLCache(
+            maxsize=int(os.getenv("GEOCODE_CACHE_MAX_ENTRIES", 10000)),
+            ttl=float(os.getenv("GEOCODE_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+        )
+        self._flight = SingleFlight()
+        self._geolocator: Optional[Nominatim] = None
+        self.gazetteer = self._load_gazetteer(self.gazetteer_path)
+    
+    async def geocode(self, query: str) -> Optional[Tuple[float, float]]:
+        """Resolve a place name to (latitude, longitude), or None if unknown"""
+        key = self.normalize(query)
+        if not key:
+            return None
+        
+        if key in self.gazetteer:
+            return self.gazetteer[key]
+        
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached or None
+        
+        coordinates = await self._flight.do(key, lambda: self._resolve(key, query))
+        return coordinates or None
+    
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Case-fold, strip accents and collapse whitespace/punctuation runs"""
+        text = unicodedata.normalize("NFKD", query)
+        text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+        text = text.replace(".", "")
+        return ", ".join(" ".join(part.split()) for part in text.split(",") if part.strip())
+    
+    async def _resolve(self, key: str, query: str) -> Tuple[float, ...]:
+        """Look the key up in the persistent cache, falling back to Nominatim
+
+        No database connection is held during the upstream call, which can
+        take up to the geocoder timeout.
+        """
+        async with async_session_maker() as session:
+            row = await session.get(GeocodeCache, key)
+        if row is not None:
+            coordinates = (row.latitude, row.longitude)
+            self.cache.set(key, coordinates)
+            return coordinates
+        
+        loop = asyncio.get_running_loop()
+        location = await loop.run_in_executor(None, self._geocode_upstream, query)
+        if location is None:
+            # Remember misses in memory only so a later upstream fix is picked up
+            self.cache.set(key, _NOT_FOUND)
+            return _NOT_FOUND
+        
+        coordinates = (location.latitude, location.longitude)
+        self.cache.set(key, coordinates)
+        async with async_session_maker() as session:
+            try:
+                session.add(GeocodeCache(
+                    query=key,
+                    latitude=location.latitude,
+                    longitude=location.longitude,
+                    display_name=location.address,
+                    source="nominatim"
+                ))
+                await session.commit()
+            except Exception as e:
+                # Another worker may have stored the same query first
+                print(f"Error caching geocode result: {e}")
+                await session.rollback()
+        return coordinates
+    
+    def _geocode_upstream(self, query: str):
+        """Blocking Nominatim call; runs in the default thread pool"""
+        if self._geolocator is None:
+            self._geolocator = Nominatim(user_agent=self.user_agent, timeout=self.timeout)
+        return self._geolocator.geocode(query)
+    
+    def _load_gazetteer(self, path: str) -> Dict[str, Tuple[float, float]]:
+        """Load the offline gazetteer (name, pipe-separated aliases, coordinates)"""
+        gazetteer = {}
+        if not os.path.exists(path):
+            return gazetteer
+        
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                coordinates = (float(row["latitude"]), float(row["longitude"]))
+                names = [row["name"]] + [a for a in (row.get("aliases") or "").split("|") if a]
+                for name in names:
+                    gazetteer.setdefault(self.normalize(name), coordinates)
+        return gazetteer
+
+geocoding_service = GeocodingService()
@@ -0,0 +1,78 @@
+import math
+from typing import List, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+MAX_PRECISION = 12
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+def encode(lat: float, lon: float, precision: int = MAX_PRECISION) -> str:
+    """Geohash of a point; prefixes of it identify the enclosing larger cells"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        if coordinate >= mid:
+            value = (value << 1) | 1
+            interval[0] = mid
+        else:
+            value <<= 1
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(height, width) of a cell in degrees"""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+def covering_prefixes(lat: float, lon: float, radius_km: float) -> List[str]:
+    """Geohash prefixes whose cells together contain the circle around a point
+
+    Uses the finest precision whose cells are at least radius_km across, then
+    the point's cell plus its eight neighbours. Returns [""] (the whole
+    world) when the circle is too large or reaches a pole.
+    """
+    radius_deg = radius_km / KM_PER_DEGREE
+    if radius_deg >= 90 or abs(lat) + radius_deg >= 90:
+        return [""]
+    # Longitude degrees shrink towards the poles; size for the widest-latitude edge
+    lon_scale = math.cos(math.radians(abs(lat) + radius_deg))
+
+    precision = 0
+    for candidate in range(1, MAX_PRECISION + 1):
+        height, width = cell_size(candidate)
+        if height < radius_deg or width * lon_scale < radius_deg:
+            break
+        precision = candidate
+    if precision == 0:
+        return [""]
+
+    height, width = cell_size(precision)
+    prefixes = set()
+    for dlat in (-height, 0.0, height):
+        for dlon in (-width, 0.0, width):
+            neighbour_lat = min(max(lat + dlat, -90.0), 90.0)
+            neighbour_lon = (lon + dlon + 180.0) % 360.0 - 180.0
+            prefixes.add(encode(neighbour_lat, neighbour_lon, precision))
+    return sorted(prefixes)
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
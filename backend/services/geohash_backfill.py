@@ -0,0 +1,49 @@
+import asyncio
+import os
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.database import async_session_maker, init_db, RiskAssessment
+from services import geohash
+
+BACKFILL_BATCH_SIZE = int(os.getenv("GEOHASH_BACKFILL_BATCH_SIZE", 1000))
+
+async def backfill_geohashes(session: AsyncSession, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Fill in the geohash of assessments stored before it was recorded; returns rows updated
+
+    Works in committed batches, so it can run against a live database and
+    be interrupted and restarted safely.
+    """
+    updated = 0
+    while True:
+        result = await session.execute(
+            select(RiskAssessment.id, RiskAssessment.latitude, RiskAssessment.longitude)
+            .where(
+                RiskAssessment.geohash.is_(None),
+                RiskAssessment.latitude.is_not(None),
+                RiskAssessment.longitude.is_not(None)
+            )
+            .order_by(RiskAssessment.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            return updated
+        
+        await session.execute(update(RiskAssessment), [
+            {"id": row.id, "geohash": geohash.encode(row.latitude, row.longitude)}
+            for row in rows
+        ])
+        await session.commit()
+        updated += len(rows)
+
+async def _main():
+    await init_db()
+    async with async_session_maker() as session:
+        count = await backfill_geohashes(session)
+    print(f"Backfilled {count} risk assessment geohashes")
+
+if __name__ == "__main__":
+    # python -m services.geohash_backfill
+    asyncio.run(_main())
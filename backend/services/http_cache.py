@@ -0,0 +1,46 @@
+import hashlib
+import json
+import os
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+CACHE_MAX_AGE_SECONDS = int(os.getenv("HTTP_CACHE_MAX_AGE_SECONDS", 300))
+
+class JSONPayload:
+    """Response body serialized once, with a strong ETag derived from its bytes"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, content: Any):
+        self.body = json.dumps(content, separators=(",", ":")).encode()
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches an ETag (weak comparison, per RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def payload_response(
+    request: Request,
+    payload: JSONPayload,
+    max_age: int = CACHE_MAX_AGE_SECONDS
+) -> Response:
+    """Serve a precomputed payload, answering 304 when the client already has it"""
+    headers = {
+        "ETag": payload.etag,
+        "Cache-Control": f"public, max-age={max_age}"
+    }
+    if etag_matches(request.headers.get("if-none-match"), payload.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
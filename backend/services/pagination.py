@@ -0,0 +1,36 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+
+from sqlalchemy import and_, or_
+
+MAX_PAGE_SIZE = 100
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor pointing just past the (created_at, id) of the last row returned"""
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+def keyset_before(created_column, id_column, cursor: str):
+    """Filter for rows that sort after the cursor in (created_at DESC, id DESC) order"""
+    created_at, row_id = decode_cursor(cursor)
+    return or_(
+        created_column < created_at,
+        and_(created_column == created_at, id_column < row_id)
+    )
+
+def clamp_page_size(limit: int) -> int:
+    """Keep page sizes within 1..MAX_PAGE_SIZE"""
+    return max(1, min(limit, MAX_PAGE_SIZE))
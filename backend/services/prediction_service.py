@@ -0,0 +1,65 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from models.prediction_model import simulate_ensemble, ensemble_to_json
+
+class PredictionService:
+    """Run Monte Carlo prediction ensembles off the event loop"""
+
+    def __init__(self):
+        self.max_workers = int(os.getenv("ENSEMBLE_WORKERS", os.cpu_count() or 1))
+        # Per simulation job, so peak memory is about max_workers times this
+        self.memory_budget_bytes = int(os.getenv("ENSEMBLE_MEMORY_BUDGET_MB", 256)) * 1024 * 1024
+        # Requests with at least this many simulated location-years use the process pool
+        self.parallel_threshold = int(os.getenv("ENSEMBLE_PARALLEL_THRESHOLD", 2_000_000))
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    async def run_ensemble(
+        self,
+        location_count: int,
+        years: int,
+        simulations: int,
+        seed: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Simulate an ensemble per location; returns the seed used and JSON-ready bands
+
+        Small requests run in a worker thread; large multi-location requests
+        are spread across a process pool, one location per task.
+        """
+        if seed is None:
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+
+        loop = asyncio.get_running_loop()
+        work = location_count * years * simulations
+        executor = self._get_pool() if location_count > 1 and work >= self.parallel_threshold else None
+
+        jobs = [
+            loop.run_in_executor(
+                executor, simulate_ensemble,
+                years, simulations, seed, index, self.memory_budget_bytes
+            )
+            for index in range(location_count)
+        ]
+        bands = await asyncio.gather(*jobs)
+
+        return {
+            "seed": seed,
+            "bands": [ensemble_to_json(b) for b in bands]
+        }
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+prediction_service = PredictionService()
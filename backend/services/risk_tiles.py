@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from models.risk_model import risk_assessment_ai, RISK_TYPES
+
+TILE_SIZE = 256
+DEFAULT_TILES_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "tiles")
+METADATA_FILE = "metadata.json"
+# Pixels scored per model call while building; bounds build memory at any zoom
+BUILD_CHUNK_PIXELS = int(os.getenv("RISK_TILES_BUILD_CHUNK_PIXELS", 16 * TILE_SIZE * TILE_SIZE))
+
+# Conditions assumed for every pixel (the scalar model's defaults)
+DEFAULT_CONDITIONS = {
+    "temperature": 15.0,
+    "humidity": 50.0,
+    "pressure": 1013.0,
+    "wind_speed": 0.0,
+    "temperature_increasing": False
+}
+
+def zoom_path(tiles_dir: str, zoom: int) -> str:
+    return os.path.join(tiles_dir, f"risk_z{zoom}.npy")
+
+def pixel_centers(zoom: int, tile_row: int, tile_start: int, tile_stop: int):
+    """Latitude of each pixel row and longitude of each pixel column in tiles
+    tile_start..tile_stop of one row of tiles (Web Mercator)"""
+    size = TILE_SIZE * 2 ** zoom
+    rows = tile_row * TILE_SIZE + np.arange(TILE_SIZE) + 0.5
+    columns = tile_start * TILE_SIZE + np.arange((tile_stop - tile_start) * TILE_SIZE) + 0.5
+    latitudes = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * rows / size))))
+    longitudes = columns / size * 360.0 - 180.0
+    return latitudes, longitudes
+
+def build_zoom(
+    zoom: int,
+    tiles_dir: str,
+    conditions: Optional[Dict[str, Any]] = None
+) -> str:
+    """Score every pixel of one zoom level and write the uint8 grids to a .npy file
+
+    The array is tile-major, shaped (hazard, tile_y, tile_x, 256, 256), so
+    each tile is one contiguous block of the file. The model is evaluated on
+    runs of tiles of at most BUILD_CHUNK_PIXELS pixels, so memory use does
+    not grow with the zoom level.
+    """
+    conditions = {**DEFAULT_CONDITIONS, **(conditions or {})}
+    tiles = 2 ** zoom
+    tiles_per_chunk = max(1, BUILD_CHUNK_PIXELS // (TILE_SIZE * TILE_SIZE))
+    path = zoom_path(tiles_dir, zoom)
+    partial = path + ".partial"
+    grid = np.lib.format.open_memmap(
+        partial, mode="w+", dtype=np.uint8,
+        shape=(len(RISK_TYPES), tiles, tiles, TILE_SIZE, TILE_SIZE)
+    )
+
+    for tile_row in range(tiles):
+        for tile_start in range(0, tiles, tiles_per_chunk):
+            tile_stop = min(tile_start + tiles_per_chunk, tiles)
+            latitudes, longitudes = pixel_centers(zoom, tile_row, tile_start, tile_stop)
+            lat = np.repeat(latitudes, len(longitudes))
+            lon = np.tile(longitudes, len(latitudes))
+            n = lat.shape[0]
+            scores = risk_assessment_ai.score_batch(
+                lat, lon,
+                np.full(n, conditions["temperature"]),
+                np.full(n, conditions["humidity"]),
+                np.full(n, conditions["pressure"]),
+                np.full(n, conditions["wind_speed"]),
+                temperature_increasing=np.full(n, bool(conditions["temperature_increasing"]))
+            )
+            # (pixel_y, tile_x, pixel_x, hazard) -> (hazard, tile_x, pixel_y, pixel_x)
+            scores = scores.astype(np.uint8).reshape(TILE_SIZE, tile_stop - tile_start, TILE_SIZE, len(RISK_TYPES))
+            grid[:, tile_row, tile_start:tile_stop] = scores.transpose(3, 1, 0, 2)
+
+    grid.flush()
+    del grid
+    # Readers holding the previous file keep their mapping; new readers see the new one
+    os.replace(partial, path)
+    return path
+
+def build_tiles(
+    max_zoom: int,
+    tiles_dir: str = DEFAULT_TILES_DIR,
+    conditions: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Build zoom levels 0..max_zoom and record what they were built from
+
+    Wildfire scores include the model's seasonal bonus for the month the
+    tiles are built in, so that month is recorded in the metadata and the
+    tiles should be rebuilt as the season changes.
+    """
+    os.makedirs(tiles_dir, exist_ok=True)
+    built_at = datetime.utcnow()
+    for zoom in range(max_zoom + 1):
+        started = time.perf_counter()
+        build_zoom(zoom, tiles_dir, conditions)
+        print(f"zoom {zoom}: {(2 ** zoom) ** 2} tiles in {time.perf_counter() - started:.1f}s")
+
+    metadata = {
+        "hazards": list(RISK_TYPES),
+        "max_zoom": max_zoom,
+        "tile_size": TILE_SIZE,
+        "conditions": {**DEFAULT_CONDITIONS, **(conditions or {})},
+        "built_at": built_at.isoformat(),
+        # Month the wildfire seasonality was evaluated for
+        "season_month": built_at.month
+    }
+    with open(os.path.join(tiles_dir, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=2)
+    return metadata
+
+class RiskTileStore:
+    """Serve tiles by slicing memory-mapped zoom grids built by build_tiles"""
+
+    def __init__(self, tiles_dir: str = DEFAULT_TILES_DIR):
+        self.tiles_dir = tiles_dir
+        self._grids: Dict[int, tuple] = {}
+
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self.tiles_dir, METADATA_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _grid(self, zoom: int) -> Optional[np.ndarray]:
+        path = zoom_path(self.tiles_dir, zoom)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        cached = self._grids.get(zoom)
+        if cached is None or cached[0] != mtime:
+            # Remap after a rebuild; the old mapping stays valid for anyone still using it
+            cached = (mtime, np.load(path, mmap_mode="r"))
+            self._grids[zoom] = cached
+        return cached[1]
+
+    def tile(self, hazard: str, zoom: int, x: int, y: int) -> Optional[memoryview]:
+        """Raw 256x256 uint8 scores for one tile, or None if it was not built
+
+        The slice is a contiguous view into the memory map, so no data is
+        copied until the bytes are sent.
+        """
+        if hazard not in RISK_TYPES:
+            return None
+        grid = self._grid(zoom)
+        if grid is None or not (0 <= x < grid.shape[2] and 0 <= y < grid.shape[1]):
+            return None
+        return memoryview(grid[RISK_TYPES.index(hazard), y, x])
+
+risk_tile_store = RiskTileStore(os.getenv("RISK_TILES_DIR", DEFAULT_TILES_DIR))
+
+if __name__ == "__main__":
+    # python -m services.risk_tiles --max-zoom 4 --temperature 22 --humidity 65
+    parser = argparse.ArgumentParser(description="Build precomputed risk raster tiles")
+    parser.add_argument("--max-zoom", type=int, default=int(os.getenv("RISK_TILES_MAX_ZOOM", 4)))
+    parser.add_argument("--tiles-dir", default=os.getenv("RISK_TILES_DIR", DEFAULT_TILES_DIR))
+    for name, value in DEFAULT_CONDITIONS.items():
+        if isinstance(value, bool):
+            parser.add_argument(f"--{name.replace('_', '-')}", action="store_true")
+        else:
+            parser.add_argument(f"--{name.replace('_', '-')}", type=float, default=value)
+    args = parser.parse_args()
+    build_tiles(
+        args.max_zoom,
+        args.tiles_dir,
+        {name: getattr(args, name) for name in DEFAULT_CONDITIONS}
+    )
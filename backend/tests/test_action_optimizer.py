@@ -0,0 +1,49 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from models.action_optimizer import select_within_budget
+
+def _actions(costs, impacts):
+    return [
+        {"title": f"action-{i}", "estimated_cost": cost, "impact_score": impact}
+        for i, (cost, impact) in enumerate(zip(costs, impacts))
+    ]
+
+def _brute_force_impact(actions, budget):
+    best = 0.0
+    for size in range(len(actions) + 1):
+        for subset in itertools.combinations(actions, size):
+            if sum(a["estimated_cost"] for a in subset) <= budget:
+                best = max(best, sum(a["impact_score"] for a in subset))
+    return best
+
+@pytest.mark.parametrize("seed", range(200))
+def test_select_within_budget_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 13))
+    # Whole-dollar costs with a budget below DEFAULT_BUDGET_CELLS keep the DP exact
+    costs = rng.integers(0, 400, n).tolist()
+    impacts = rng.integers(1, 100, n).tolist()
+    budget = int(rng.integers(0, 1500))
+    actions = _actions(costs, impacts)
+
+    chosen = select_within_budget(actions, budget)
+
+    assert sum(a["estimated_cost"] for a in chosen) <= budget
+    assert sum(a["impact_score"] for a in chosen) == _brute_force_impact(actions, budget)
+    # Selected actions keep their input order
+    positions = [actions.index(a) for a in chosen]
+    assert positions == sorted(positions)
+
+def test_select_within_budget_keeps_free_actions_and_drops_unaffordable():
+    actions = _actions([0, 50, 5000, 30], [10, 40, 99, 20])
+    chosen = select_within_budget(actions, 60)
+    assert [a["title"] for a in chosen] == ["action-0", "action-1"]
+
+def test_select_within_budget_respects_large_fractional_budgets():
+    rng = np.random.default_rng(7)
+    actions = _actions(rng.uniform(1, 20000, 300).tolist(), rng.uniform(1, 100, 300).tolist())
+    chosen = select_within_budget(actions, 100000.5)
+    assert sum(a["estimated_cost"] for a in chosen) <= 100000.5
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from models.risk_model import risk_assessment_ai
+
+def _random_inputs(rng: np.random.Generator, n: int):
+    """Climate and historical payloads covering missing fields, short histories and trends"""
+    climate_data, historical_data = [], []
+    for _ in range(n):
+        climate = {
+            "temperature": float(rng.uniform(-15, 48)),
+            "humidity": float(rng.uniform(0, 100)),
+            "pressure": float(rng.uniform(960, 1050)),
+            "wind_speed": float(rng.uniform(0, 45))
+        }
+        # Drop fields now and then to exercise the scalar defaults
+        for name in list(climate):
+            if rng.random() < 0.1:
+                del climate[name]
+        climate_data.append(climate)
+
+        shape = rng.integers(0, 4)
+        if shape == 0:
+            historical_data.append({})
+        else:
+            months = int(rng.integers(0, 25))
+            history = {
+                "historical_data": [
+                    {"total_precipitation": float(rng.uniform(0, 300))} for _ in range(months)
+                ]
+            }
+            if shape > 1:
+                history["trends"] = {
+                    "temperature_trend": str(rng.choice(["increasing", "stable", "decreasing"]))
+                }
+            historical_data.append(history)
+    return climate_data, historical_data
+
+# The scalar path averages empty precipitation histories to NaN, as the batch path does
+@pytest.mark.filterwarnings("ignore:Mean of empty slice", "ignore:invalid value encountered")
+@pytest.mark.parametrize("seed", range(5))
+def test_assess_risk_batch_matches_scalar(seed):
+    rng = np.random.default_rng(seed)
+    n = 400
+    lat = rng.uniform(-80, 80, n)
+    lon = rng.uniform(-180, 180, n)
+    # Include the hazard band edges the scalar rules branch on
+    lat[:8] = [0.0, 10.0, 23.5, 30.0, 35.0, 40.0, -30.0, -60.0]
+    locations = [f"loc-{i}" for i in range(n)]
+    climate_data, historical_data = _random_inputs(rng, n)
+
+    batch = risk_assessment_ai.assess_risk_batch(
+        locations=locations,
+        lat=lat,
+        lon=lon,
+        **risk_assessment_ai.to_batch_columns(climate_data, historical_data)
+    )
+
+    assert len(batch) == n
+    for i, result in enumerate(batch):
+        expected = risk_assessment_ai.assess_risk(
+            locations[i], float(lat[i]), float(lon[i]), climate_data[i], historical_data[i]
+        )
+        expected.pop("assessment_date")
+        result = dict(result)
+        result.pop("assessment_date")
+        assert result == expected, f"row {i}"
+
+def test_assess_risk_batch_empty():
+    columns = risk_assessment_ai.to_batch_columns([], [])
+    assert risk_assessment_ai.assess_risk_batch(locations=[], lat=[], lon=[], **columns) == []